@@ -0,0 +1,61 @@
+"""Stress the edit distance comparer from several threads.
+
+Usage: python -m benchmarks.editdistance_stress [num_pairs] [threads]
+
+One thread safe comparer is shared by a thread pool which scores
+answer/guess pairs of mixed lengths, so the per-thread scratch buffers
+grow while other threads are using theirs. Every result is checked
+against a single threaded run with a fresh comparer, and both runs are
+timed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import random
+import sys
+import time
+
+from chagtriviabot.editdistance import DistanceAlgorithm, EditDistance
+from chagtriviabot.questionstore import QuestionStore
+
+def make_pairs(store, num_pairs, rng):
+    pairs = []
+    for _ in range(num_pairs):
+        answer = rng.choice(store.answers).lower()
+        if rng.random() < 0.5:
+            guess = rng.choice(store.answers).lower()
+        else:
+            chars = list(answer)
+            for _ in range(rng.randint(0, 3)):
+                chars[rng.randrange(len(chars))] = rng.choice("aeiourst")
+            guess = "".join(chars)
+        max_distance = rng.choice([2, 5, 2 ** 31 - 1])
+        pairs.append((answer, guess, max_distance))
+    return pairs
+
+def main(num_pairs=20000, num_threads=8):
+    store = QuestionStore()
+    store.load("triviaset", "csv")
+    pairs = make_pairs(store, num_pairs, random.Random(0))
+
+    reference = EditDistance(DistanceAlgorithm.DAMERUAUOSA)
+    start = time.perf_counter()
+    expected = [reference.compare(*pair) for pair in pairs]
+    serial = time.perf_counter() - start
+
+    shared = EditDistance(DistanceAlgorithm.DAMERUAUOSA, is_thread_safe=True)
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda pair: shared.compare(*pair), pairs,
+                                chunksize=64))
+        threaded = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(expected, results))
+    print(f"{num_pairs} pairs | 1 thread: {serial:.3f}s | "
+          f"{num_threads} threads: {threaded:.3f}s | "
+          f"mismatches: {mismatches}")
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1 :]))
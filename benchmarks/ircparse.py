@@ -0,0 +1,50 @@
+"""Benchmark the IRC message parser on Twitch chat lines.
+
+Usage: python -m benchmarks.ircparse [num_lines]
+
+Parses tagged PRIVMSG lines and reads the fields the bot uses for every
+chat message (command, nick and text) plus the tmi-sent-ts tag.
+"""
+import random
+import sys
+import time
+
+from chagtriviabot.ircmessage import IrcMessage, split_lines
+
+TEMPLATE = ("@badge-info=;badges=subscriber/12,premium/1;color=#1E90FF;"
+            "display-name={display};emotes=;first-msg=0;flags=;"
+            "id=5f7e3c1a-0d4b-4b8e-9b1f-2f6f0e6c{n:04d};mod=0;"
+            "returning-chatter=0;room-id=123456789;subscriber=1;"
+            "tmi-sent-ts={ts};turbo=0;user-id={uid};user-type= "
+            ":{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #channel :{text}")
+TEXTS = ["four thousand", "lol", "the beatles", "KEKW no idea",
+         "modern english", "is it paris?", "gg", "Tchaikovsky"]
+
+def make_buffer(num_lines, rng):
+    lines = []
+    for n in range(num_lines):
+        nick = f"viewer_{rng.randrange(5000)}"
+        lines.append(TEMPLATE.format(display=nick.title(), n=n % 10000,
+                                     ts=1700000000000 + n,
+                                     uid=rng.randrange(10 ** 9), nick=nick,
+                                     text=rng.choice(TEXTS)))
+    return bytearray(("\r\n".join(lines) + "\r\n").encode("utf-8"))
+
+def main(num_lines=200000):
+    buffer = make_buffer(num_lines, random.Random(0))
+    size = len(buffer)
+    start = time.perf_counter()
+    count = 0
+    for line in split_lines(buffer):
+        msg = IrcMessage(line)
+        if msg.command == b"PRIVMSG":
+            msg.nick
+            msg.trailing
+            msg.tag("tmi-sent-ts")
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{count} lines ({size / 1e6:.1f} MB) in {elapsed:.3f}s: "
+          f"{count / elapsed:,.0f} lines/s")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1 :]))
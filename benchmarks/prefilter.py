@@ -0,0 +1,96 @@
+"""Benchmark the answer prefilter on synthetic chat.
+
+Usage: python -m benchmarks.prefilter [num_questions] [lines_per_question]
+
+For each sampled question a chat population is generated of mostly
+unrelated lines (words taken from other questions), wrong answers and
+misspellings of the right answer, with a share of lines repeating an
+earlier one as chat does. Every line is checked with and
+without the prefilter, and the bound is verified to never exceed the
+real closeness.
+"""
+import logging
+import random
+import sys
+import time
+
+from chagtriviabot.questionstore import QuestionStore
+from chagtriviabot.triviasession import TriviaSession
+
+# Share of lines which repeat an earlier line of the same question
+REPEAT = 0.3
+
+def misspell(answer, rng):
+    chars = list(answer)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+def chat_lines(store, qid, num_lines, rng):
+    words = rng.choice(store.questions).split()
+    lines = []
+    for _ in range(num_lines):
+        if lines and rng.random() < REPEAT:
+            lines.append(rng.choice(lines))
+            continue
+        roll = rng.random()
+        if roll < 0.7:
+            words = rng.choice(store.questions).split()
+            lines.append(" ".join(rng.sample(words,
+                                             min(len(words),
+                                                 rng.randint(1, 6)))))
+        elif roll < 0.9:
+            lines.append(rng.choice(store.answers))
+        else:
+            lines.append(misspell(store.answer(qid), rng))
+    return lines
+
+def run(session, chats, use_prefilter):
+    verdicts = []
+    elapsed = 0.0
+    for qid, lines in chats:
+        session.data = [qid]
+        session.q_no = 0
+        session.guess_cache.clear()
+        session.prepare_question(2)
+        if not use_prefilter:
+            session.prefilter = None
+        start = time.process_time()
+        verdicts.extend(session.fuzzy_match(line) for line in lines)
+        elapsed += time.process_time() - start
+    return verdicts, elapsed
+
+def main(num_questions=50, lines_per_question=200):
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+    store = QuestionStore()
+    store.load("triviaset", "csv")
+    session = TriviaSession()
+    session.reset(store)
+    chats = [(qid, chat_lines(store, qid, lines_per_question, rng))
+             for qid in rng.sample(range(len(store)), num_questions)]
+
+    filtered = checked = 0
+    for qid, lines in chats:
+        session.data = [qid]
+        session.q_no = 0
+        session.prepare_question(2)
+        for line in lines:
+            guess = line.lower()
+            bound = session.prefilter.lower_bound(guess)
+            assert bound <= session.closeness(guess) + 1e-9, (qid, line)
+            filtered += session.prefilter.rejects(guess, 0.4)
+            checked += 1
+
+    baseline, base_time = run(session, chats, False)
+    result, filter_time = run(session, chats, True)
+    assert baseline == result
+    print(f"lines: {checked}")
+    print(f"filtered at tolerance 0.4: {filtered / checked:.1%}")
+    print(f"without prefilter: {base_time:.3f}s CPU")
+    print(f"with prefilter: {filter_time:.3f}s CPU "
+          f"({1 - filter_time / base_time:.1%} saved)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1 :]))
@@ -0,0 +1,119 @@
+"""Accuracy and speed of multi-word answer matching.
+
+Usage: python -m benchmarks.tokenalign [num_answers] [guesses_per_answer]
+
+Builds a labelled set from the multi-word answers in triviaset.csv, plus
+a third as many one-word answers: guesses which should be accepted (one
+typo, an extra leading word, only an article before one-word answers, a
+dropped word from answers of three or more words) and guesses which
+should not (other answers with the same number of words). Each guess is
+scored with the old positional token pairing and with the alignment in
+:meth:`TriviaSession.closeness`, at the tolerance before any hint.
+The alignment is then timed on a chat-like stream with repeated
+guesses, with and without the per-question token distance memo.
+"""
+import logging
+import random
+from statistics import mean
+import sys
+import time
+
+from chagtriviabot.questionstore import QuestionStore
+from chagtriviabot.triviasession import TriviaSession
+
+def positional_closeness(session, guess):
+    """Closeness as computed before token alignment"""
+    ans_parts = session.answer().lower().split(" ")
+    msg_parts = guess.split(" ")
+    dist = [session.comparer.compare(a, m, 2 ** 31 - 1)
+            / max(len(a), len(m), 1)
+            for a, m in zip(ans_parts, msg_parts)]
+    dist.extend([1.0] * abs(len(ans_parts) - len(msg_parts)))
+    return mean(dist)
+
+def typo(token, rng):
+    i = rng.randrange(len(token))
+    return token[: i] + rng.choice("aeioust") + token[i + 1 :]
+
+def labelled_guesses(store, qid, num_guesses, by_length, rng):
+    tokens = store.answer(qid).lower().split(" ")
+    guesses = []
+    for _ in range(num_guesses):
+        kind = rng.randrange(4)
+        if kind == 0:
+            i = rng.randrange(len(tokens))
+            guess = tokens[: i] + [typo(tokens[i], rng)] + tokens[i + 1 :]
+            guesses.append((" ".join(guess), True))
+        elif kind == 1:
+            word = rng.choice(["the", "a"] if len(tokens) == 1
+                              else ["the", "a", "its", "is"])
+            guesses.append((" ".join([word] + tokens), True))
+        elif kind == 2 and len(tokens) >= 3:
+            i = rng.randrange(len(tokens))
+            guesses.append((" ".join(tokens[: i] + tokens[i + 1 :]), True))
+        else:
+            other = rng.choice(by_length[len(tokens)])
+            if other != qid:
+                guesses.append((store.answer(other).lower(), False))
+    return guesses
+
+def main(num_answers=300, guesses_per_answer=20):
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+    store = QuestionStore()
+    store.load("triviaset", "csv")
+    session = TriviaSession()
+    session.reset(store)
+    by_length = {}
+    for qid, answer in enumerate(store.answers):
+        by_length.setdefault(len(answer.split(" ")), []).append(qid)
+    multi_word = [qid for qid in range(len(store))
+                  if len(store.answer(qid).split(" ")) > 1]
+    one_word = [qid for qid in range(len(store))
+                if len(store.answer(qid).split(" ")) == 1]
+    sample = (rng.sample(multi_word, num_answers)
+              + rng.sample(one_word, num_answers // 3))
+    tests = [(qid, labelled_guesses(store, qid, guesses_per_answer,
+                                    by_length, rng)) for qid in sample]
+
+    tol = session.TOLERANCE
+    counts = {"positional": [0, 0, 0, 0], "aligned": [0, 0, 0, 0]}
+    for qid, guesses in tests:
+        session.data = [qid]
+        session.q_no = 0
+        session.prepare_question(2)
+        for guess, expected in guesses:
+            for name, closeness in (
+                    ("positional", positional_closeness(session, guess)),
+                    ("aligned", session.closeness(guess))):
+                # true pos, false neg, true neg, false pos
+                accepted = closeness < tol
+                counts[name][(0 if accepted else 1) if expected
+                             else (3 if accepted else 2)] += 1
+    print(f"{sum(len(g) for _, g in tests)} labelled guesses for "
+          f"{num_answers} multi-word and {num_answers // 3} one-word "
+          f"answers, tolerance {tol}")
+    for name, (tp, fn, tn, fp) in counts.items():
+        print(f"{name:<12} accepted {tp}/{tp + fn} right guesses, "
+              f"rejected {tn}/{tn + fp} wrong guesses")
+
+    # Chat repeats the same few words, which is what the memo exploits
+    streams = [(qid, [rng.choice(guesses)[0] for _ in range(200)])
+               for qid, guesses in tests]
+    for memo in (False, True):
+        start = time.process_time()
+        for qid, stream in streams:
+            session.data = [qid]
+            session.q_no = 0
+            session.prepare_question(2)
+            for guess in stream:
+                if not memo:
+                    session.token_distances.clear()
+                session.closeness(guess)
+        elapsed = time.process_time() - start
+        print(f"{'with' if memo else 'without'} token memo: "
+              f"{elapsed:.3f}s CPU for "
+              f"{sum(len(s) for _, s in streams)} guesses")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1 :]))
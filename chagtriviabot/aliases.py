@@ -0,0 +1,183 @@
+"""
+.. module:: aliases
+   :synopsis: Alternate accepted forms of trivia answers
+"""
+import re
+
+UNITS = ["zero", "one", "two", "three", "four", "five", "six", "seven",
+         "eight", "nine", "ten", "eleven", "twelve", "thirteen", "fourteen",
+         "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy",
+        "eighty", "ninety"]
+SCALES = [(10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand")]
+ARTICLES = ("the ", "a ", "an ")
+
+_WORD_VALUES = {word: i for i, word in enumerate(UNITS)}
+_WORD_VALUES.update({word: 10 * i for i, word in enumerate(TENS) if word})
+_SCALE_VALUES = dict((word, value) for value, word in SCALES)
+_SCALE_VALUES["hundred"] = 100
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SEPARATORS = re.compile(r"[-_/]")
+_WHITESPACE = re.compile(r"\s+")
+_PARENTHETICAL = re.compile(r"\(([^()]*)\)")
+# "(or Colour)", "(aka Muhammad Ali)": bracketed text marked as an
+# alternative answer
+_MARKED_ALTERNATIVE = re.compile(
+    r"\(\s*(?:or|aka|a\.k\.a\.?|also known as)\s+([^()]*)\)",
+    re.IGNORECASE)
+
+def normalize_answer(text):
+    """Reduce an answer or a guess to the form used for alias lookup:
+    lowercase, hyphens/slashes as spaces, no punctuation and single
+    spaces.
+
+    Parameters
+    ----------
+    text : str
+        Answer or guess text.
+
+    Returns
+    -------
+    str
+        The normalized text.
+    """
+    text = _SEPARATORS.sub(" ", text.lower())
+    text = _PUNCTUATION.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def number_to_words(number):
+    """Spell out a non-negative integer, e.g. 4000 -> "four thousand".
+
+    Parameters
+    ----------
+    number : int
+        The number to spell out.
+
+    Returns
+    -------
+    str
+        The number in words.
+    """
+    if number < 20:
+        return UNITS[number]
+    if number < 100:
+        tens, units = divmod(number, 10)
+        return TENS[tens] + (f" {UNITS[units]}" if units else "")
+    if number < 1000:
+        hundreds, rest = divmod(number, 100)
+        return (f"{UNITS[hundreds]} hundred"
+                + (f" {number_to_words(rest)}" if rest else ""))
+    for value, word in SCALES:
+        if number >= value:
+            count, rest = divmod(number, value)
+            return (f"{number_to_words(count)} {word}"
+                    + (f" {number_to_words(rest)}" if rest else ""))
+    raise ValueError(f"Cannot spell out {number}")
+
+def words_to_number(words):
+    """Parse a list of number words, e.g. ["four", "thousand"] -> 4000.
+
+    Parameters
+    ----------
+    words : list of str
+        Lowercase number words. "and" is allowed between them.
+
+    Returns
+    -------
+    int or None
+        The value of the words, or None if they are not a number.
+    """
+    total = current = 0
+    seen = False
+    for word in words:
+        if word == "and" and seen:
+            continue
+        if word in _WORD_VALUES:
+            current += _WORD_VALUES[word]
+        elif word == "hundred" and seen:
+            current *= 100
+        elif word in _SCALE_VALUES and seen:
+            total += current * _SCALE_VALUES[word]
+            current = 0
+        else:
+            return None
+        seen = True
+    return total + current if seen else None
+
+def _is_number_word(word):
+    return word in _WORD_VALUES or word in _SCALE_VALUES
+
+def _convert_numbers(form):
+    """Return `form` with runs of number words replaced by digits and
+    digits replaced by words, or None if it contains no numbers.
+    """
+    words = form.split(" ")
+    out = []
+    changed = False
+    i = 0
+    while i < len(words):
+        if words[i].isdigit() and len(words[i]) <= 12:
+            out.append(number_to_words(int(words[i])))
+            changed = True
+            i += 1
+            continue
+        j = i
+        while j < len(words) and (_is_number_word(words[j])
+                                  or (words[j] == "and" and j > i)):
+            j += 1
+        # do not swallow a trailing "and" which is not part of a number
+        while j > i and words[j - 1] == "and":
+            j -= 1
+        value = words_to_number(words[i : j]) if j > i else None
+        if value is None:
+            out.append(words[i])
+            i += 1
+        else:
+            out.append(str(value))
+            changed = True
+            i = j
+    return " ".join(out) if changed else None
+
+def expand_answer(answer):
+    """Generate the alternate forms accepted for `answer`: the answer
+    without bracketed text, bracketed alternatives marked as such,
+    forms without a leading article and number words <-> digits.
+
+    Parameters
+    ----------
+    answer : str
+        The cleaned answer text.
+
+    Returns
+    -------
+    frozenset of str
+        The normalized accepted forms, including the answer itself.
+    """
+    raw_forms = {answer}
+    # "Modern English (band)" -> "Modern English", "Modern English band".
+    # Bracketed text is usually context ("Reykjavik (Iceland)"), so it is
+    # only an answer on its own when marked, e.g. "Cassius Clay (aka
+    # Muhammad Ali)". " or " and "/" are not split either, as they occur
+    # in titles ("Live Free or Die") and compound answers.
+    if "(" in answer:
+        raw_forms.add(_PARENTHETICAL.sub(" ", answer))
+        raw_forms.update(_MARKED_ALTERNATIVE.findall(answer))
+        unmarked = _MARKED_ALTERNATIVE.sub(" ", answer)
+        if "(" in unmarked:
+            raw_forms.add(unmarked.replace("(", " ").replace(")", " "))
+
+    forms = set()
+    for form in raw_forms:
+        form = normalize_answer(form)
+        if not form:
+            continue
+        forms.add(form)
+        for article in ARTICLES:
+            if form.startswith(article) and len(form) > len(article):
+                forms.add(form[len(article) :])
+    for form in list(forms):
+        converted = _convert_numbers(form)
+        if converted:
+            forms.add(converted)
+    return frozenset(forms)
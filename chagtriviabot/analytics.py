@@ -0,0 +1,160 @@
+"""
+.. module:: analytics
+   :synopsis: Per-session question analytics
+
+Usage: python -m chagtriviabot.analytics <session.csv.gz> [...]
+
+Events are buffered in typed arrays while a session runs and written in
+one go as a gzipped CSV when it ends. Running the module prints a
+report over one or more of those files.
+"""
+from array import array
+from collections import defaultdict
+import csv
+import gzip
+import os
+from statistics import median
+import sys
+import time
+
+ASKED = 0
+GUESS = 1
+HINT = 2
+ANSWERED = 3
+SKIPPED = 4
+EVENT_NAMES = ["asked", "guess", "hint", "answered", "skipped"]
+# Stage which decided a guess, see TriviaSession.last_stage
+STAGES = ["", "exact", "normalized", "phonetic", "edit", "prefilter"]
+COLUMNS = ["q_no", "question_id", "event", "t", "value", "correct", "stage"]
+
+class SessionRecorder:
+    """Buffers the events of one session column by column.
+
+    Every event has the question number and id, the event type, the
+    seconds since the question was asked, a value (closeness for
+    guesses, hint stage for hints), a correct flag and, for guesses,
+    the stage which decided them.
+    """
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.event)
+
+    def clear(self):
+        self.q_no = array("H")
+        self.question_id = array("I")
+        self.event = array("B")
+        self.t = array("f")
+        self.value = array("f")
+        self.correct = array("B")
+        self.stage = array("B")
+
+    def record(self, q_no, question_id, event, t, value=0.0, correct=False,
+               stage=""):
+        self.q_no.append(q_no)
+        self.question_id.append(question_id)
+        self.event.append(event)
+        self.t.append(t)
+        self.value.append(value)
+        self.correct.append(bool(correct))
+        self.stage.append(STAGES.index(stage))
+
+    def flush(self, directory):
+        """Write the buffered events to a new gzipped CSV in `directory`
+        and clear the buffer.
+
+        Returns
+        -------
+        str or None
+            Path of the written file, or None if there were no events.
+        """
+        if not len(self):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S"))
+        path = f"{stem}.csv.gz"
+        n = 1
+        while os.path.exists(path):
+            path = f"{stem}-{n}.csv.gz"
+            n += 1
+        with gzip.open(path, "wt", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(COLUMNS)
+            writer.writerows(
+                zip(self.q_no, self.question_id,
+                    (EVENT_NAMES[e] for e in self.event),
+                    (f"{t:.3f}" for t in self.t),
+                    (f"{v:.4f}" for v in self.value), self.correct,
+                    (STAGES[s] for s in self.stage)))
+        self.clear()
+        return path
+
+def read_events(paths):
+    for path in paths:
+        with gzip.open(path, "rt", newline="") as events:
+            for row in csv.DictReader(events):
+                yield path, row
+
+def quantiles(values, points=(0.1, 0.5, 0.9)):
+    values = sorted(values)
+    return [values[min(len(values) - 1, int(p * len(values)))]
+            for p in points] if values else []
+
+def report(paths):
+    questions = defaultdict(lambda: {"guesses": 0, "hints": 0,
+                                     "answered": None, "skipped": False})
+    closeness = []
+    near_misses = []
+    stages = defaultdict(int)
+    for path, row in read_events(paths):
+        question = questions[(path, row["q_no"])]
+        event = row["event"]
+        if event == "guess":
+            question["guesses"] += 1
+            # Files written before stages were recorded
+            stage = row.get("stage", "edit")
+            stages[stage or "none"] += 1
+            # Only the edit distance measures rejected guesses, for the
+            # others the value is a bound or a placeholder
+            if stage != "edit" and row["correct"] != "1":
+                continue
+            value = float(row["value"])
+            closeness.append(value)
+            if row["correct"] == "0" and value < 0.6:
+                near_misses.append(value)
+        elif event == "hint":
+            question["hints"] = max(question["hints"],
+                                    int(float(row["value"])))
+        elif event == "answered":
+            question["answered"] = float(row["t"])
+        elif event == "skipped":
+            question["skipped"] = True
+
+    answered = [q for q in questions.values() if q["answered"] is not None]
+    print(f"questions: {len(questions)} | answered: {len(answered)} | "
+          f"skipped: {sum(q['skipped'] for q in questions.values())}")
+    if answered:
+        times = [q["answered"] for q in answered]
+        print("time to first correct answer (p10/p50/p90): "
+              + " / ".join(f"{t:.1f}s" for t in quantiles(times)))
+        by_hints = defaultdict(int)
+        for q in answered:
+            by_hints[q["hints"]] += 1
+        print("answered after N hints: "
+              + ", ".join(f"{n}: {count}"
+                          for n, count in sorted(by_hints.items())))
+    if questions:
+        print(f"guesses per question (median): "
+              f"{median(q['guesses'] for q in questions.values()):.0f}")
+    if stages:
+        print("guesses decided by: "
+              + ", ".join(f"{stage}: {count}"
+                          for stage, count in sorted(stages.items())))
+    if closeness:
+        print("guess closeness (p10/p50/p90): "
+              + " / ".join(f"{c:.2f}" for c in quantiles(closeness)))
+        print(f"rejected guesses with closeness < 0.6: {len(near_misses)}")
+
+if __name__ == "__main__":
+    report(sys.argv[1 :])
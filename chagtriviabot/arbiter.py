@@ -0,0 +1,64 @@
+import heapq
+
+class AnswerArbiter:
+    """Collects the correct answers to a question for a short window and
+    orders them by the time Twitch received them (the tmi-sent-ts tag)
+    rather than by the order the bot happened to read them.
+
+    Answers are kept in a heap, so each one costs O(log n) and picking
+    the winner and `k` runners-up costs O(k log n).
+
+    Parameters
+    ----------
+    window : float, optional
+        Seconds to keep collecting after the first correct answer.
+    """
+    def __init__(self, window=0.0):
+        self.window = window
+        self.deadline = None
+        self._heap = []
+        self._users = set()
+        self._seq = 0
+
+    def is_open(self):
+        return self.deadline is not None
+
+    def is_due(self, now):
+        return self.deadline is not None and now >= self.deadline
+
+    def submit(self, username, sent_ts, now):
+        """Record a correct answer. Only a user's first answer counts.
+
+        Parameters
+        ----------
+        username : str
+            User who answered.
+        sent_ts : int
+            Server timestamp of the message in milliseconds.
+        now : float
+            Current time in seconds, opens the window on the first
+            answer.
+        """
+        if username in self._users:
+            return
+        if self.deadline is None:
+            self.deadline = now + self.window
+        self._users.add(username)
+        # seq breaks timestamp ties in arrival order
+        heapq.heappush(self._heap, (sent_ts, self._seq, username))
+        self._seq += 1
+
+    def result(self, runners_up=0):
+        """Close the window and return the winner followed by up to
+        `runners_up` further users, in server time order.
+        """
+        users = [heapq.heappop(self._heap)[2]
+                 for _ in range(min(len(self._heap), 1 + runners_up))]
+        self.reset()
+        return users
+
+    def reset(self):
+        self.deadline = None
+        self._heap = []
+        self._users = set()
+        self._seq = 0
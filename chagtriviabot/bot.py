@@ -1,35 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
 import configparser
 import errno
 import logging
 import os.path
+import threading
 import time
 import types
 
-import pandas as pd
-
+from chagtriviabot import analytics
+from chagtriviabot.arbiter import AnswerArbiter
 from chagtriviabot.chat import Chat
-from chagtriviabot.helpers import pluralize, try_parse_int64
+from chagtriviabot.checkpoint import SessionCheckpoint
+from chagtriviabot.clock import Clock
+from chagtriviabot.helpers import LRUCache, pluralize, try_parse_int64
+from chagtriviabot.leaderboard import DAY, PERIODS
+from chagtriviabot.memprofile import MemoryProfiler, freeze_heap
+from chagtriviabot.phonetic import ENCODERS
+from chagtriviabot.questionstore import QuestionStore
+from chagtriviabot.sampler import StackSampler
+from chagtriviabot.scorefeed import FeedServer, ScoreFeed
+from chagtriviabot.scoreservice import ScoreClient
 from chagtriviabot.scoretracker import ScoreTracker
 from chagtriviabot.triviasession import TriviaSession
 
 CONFIG_PATH = "config.ini"
 SCORES_PATH = "userscores.txt"
+PERIODS_PATH = "periodscores.txt"
+CHECKPOINT_PATH = "session.json"
+PROFILE_DIR = "profiles"
 LOG = logging.getLogger("Trivia")
 
 class ChagTriviaBot:
     CMDS = ["triviastart", "triviaend", "top", "score", "next", "stop",
-            "loadconfig"]
+            "loadconfig", "memory", "profile"]
     POS = ["1st", "2nd", "3rd"]
+    # Seconds a reply built from score service totals is reused for,
+    # as other bots change them without the version changing here
+    SERVICE_CACHE_TTL = 10
 
-    def __init__(self):
+    def __init__(self, clock=None):
         LOG.info("Bot starting...")
+        self.clock = Clock() if clock is None else clock
         self.name = "Chag Trivia Bot"
         self.version = "0.3.0"
         self.is_loaded = False
         self.is_running = False
         self.chat = Chat(self)
         self.scores = ScoreTracker()
+        # Client of a score service shared with other bots, if any
+        self.score_service = None
+        # Live score feed for overlays, if enabled
+        self.feed_server = None
+        # Rendered !top/!score replies keyed by (command, args, version)
+        self.render_cache = LRUCache(256)
         self.var = types.SimpleNamespace()
+        # Last applied config, used to diff against on reload
+        self.config = None
+        # (filename, filetype, mtime, size, phonetic encoder) of the loaded
+        # question source
+        self.source_key = None
+        # Question store built by a background reload, swapped in by the
+        # main loop
+        self.pending_store = None
+        self.store_loader = None
+        # Quizset for the next session, built in the background while
+        # idle or during a session
+        self.next_quizset = None
+        self.quizset_builder = None
+        # Store and session length the next quizset is wanted for. A
+        # builder which finishes with other ones builds again
+        self.quizset_wanted = None
+        self.quizset_lock = threading.Lock()
 
         ###############################################################
         # Trivia variables
@@ -38,7 +79,18 @@ class ChagTriviaBot:
         self.is_active = False
         # Flag for when a question is actively being asked
         self.question_asked = False
-        self.session = TriviaSession()
+        self.session = TriviaSession(self.clock)
+        # Orders correct answers arriving close together by server time
+        self.arbiter = AnswerArbiter()
+        # Per-question events, written out when the session ends
+        self.recorder = analytics.SessionRecorder()
+        self.checkpoint = SessionCheckpoint(CHECKPOINT_PATH)
+        # Workers scoring a batch of chat lines in parallel, None to
+        # check guesses on the main thread only
+        self.check_pool = None
+        self.check_threads = 0
+        self.memory = MemoryProfiler()
+        self.sampler = StackSampler()
         # Time when the last question was asked
         self.ask_time = 0
         # Ongoing active timer
@@ -47,87 +99,355 @@ class ChagTriviaBot:
     ###################################################################
     # Backend
     ###################################################################
-    def load_config(self):
+    def read_config(self):
         if not os.path.exists(CONFIG_PATH):
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
                                     CONFIG_PATH)
         config = configparser.ConfigParser()
         config.read(CONFIG_PATH)
+        return config
+
+    def load_config(self):
+        config = self.read_config()
         self.chat.set_config(config["Bot"])
         self.set_variables(config)
+        self.config = config
         LOG.info("Config loaded.")
 
+    def reload_config(self):
+        """Re-read the config and apply only what changed. The question
+        source is reloaded in the background, and only if its settings
+        or the file itself changed. An in-flight session is kept.
+
+        Returns
+        -------
+        bool
+            False if the config is invalid, in which case the last
+            valid one stays in use.
+        """
+        config = self.read_config()
+        changed = [f"{section}.{key}" for section in config.sections()
+                   for key, value in config[section].items()
+                   if self.config is None
+                   or not self.config.has_option(section, key)
+                   or self.config[section][key] != value]
+        bot_changed = any(key.startswith("Bot.") for key in changed)
+        if bot_changed:
+            self.chat.set_config(config["Bot"])
+        # The chat settings are checked before set_variables can start
+        # reloading the trivia set
+        if self.chat.is_ready():
+            self.set_variables(config, background=True)
+        if not (self.is_ready() and self.chat.is_ready()):
+            LOG.error("Config NOT reloaded! Check config file.")
+            # Go back to the last valid settings
+            if self.config is not None:
+                if bot_changed:
+                    self.chat.set_config(self.config["Bot"])
+                self.set_variables(self.config, background=True)
+            return False
+        self.config = config
+        if bot_changed:
+            # The login and channel are only sent on connect
+            self.chat.close()
+            self.chat.start()
+        LOG.info("Config reloaded. Changed: %s", ", ".join(changed) or "none")
+        return True
+
     def load_scores(self):
         self.scores.load(SCORES_PATH)
+        self.scores.load_periods(PERIODS_PATH, self.clock.time())
         LOG.info("Scores loaded.")
 
-    def set_variables(self, config):
+    def set_variables(self, config, background=False):
         try:
-            self.set_trivia_variables(config["Trivia"])
+            # Trivia last, as it ends by (re)loading the trivia set, which
+            # a config rejected by any other check must not do
             self.set_admin_variables(config["Admin"])
+            self.set_trivia_variables(config["Trivia"], background)
             self.is_loaded = True
         except (KeyError, ValueError):
             LOG.error("Config not loaded! Check config file and reboot bot.")
             self.is_loaded = False
 
-    def set_trivia_variables(self, config):
+    def set_trivia_variables(self, config, background=False):
         self.var.PREFIX = config["prefix"]
         filename = config["filename"]
         filetype = config["filetype"]
         self.var.num_qs = int(config["num_qs"])
         self.var.delay = int(config["delay"])
-        self.var.hint_time_1 = int(config["hint_time_1"])
-        self.var.hint_time_2 = int(config["hint_time_2"])
+        # Seconds after the question at which each hint is given. Older
+        # configs set the two hints with hint_time_1 and hint_time_2
+        if "hint_times" in config:
+            hint_times = config["hint_times"].split(",")
+        else:
+            hint_times = [config["hint_time_1"], config["hint_time_2"]]
+        self.var.hint_times = sorted(int(t) for t in hint_times)
         self.var.skip_time = int(config["skip_time"])
         self.var.correct = config["correct"]
         self.var.wrong = config["wrong"]
-
-        # open trivia source based on type
-        if filetype == "csv":
-            self.var.ts = pd.read_csv(f"{filename}.{filetype}")
-        elif filetype in ("xlsx", "xls"):
-            self.var.ts = pd.read_excel(f"{filename}.{filetype}")
+        # Seconds to collect correct answers before picking the winner,
+        # and how many runners-up also get a point
+        self.arbiter.window = float(config.get("answer_window", "0"))
+        self.var.runners_up = int(config.get("runners_up", "0"))
+        # Directory for session analytics, empty to disable
+        self.var.analytics_dir = config.get("analytics_dir", "")
+        # Recorded closeness is only useful if far guesses are measured
+        self.session.set_uncapped(bool(self.var.analytics_dir))
+        self.set_check_threads(int(config.get("check_threads", "0")))
+        self.set_score_service(config.get("score_service", ""))
+        self.set_feed_port(int(config.get("feed_port", "0")))
+        # Answer matchers, cheapest first, and the phonetic encoding
+        matchers = [name.strip() for name in config.get(
+            "matchers", ",".join(TriviaSession.MATCHERS)).split(",")]
+        if any(name not in TriviaSession.MATCHERS for name in matchers):
+            raise ValueError(f"Unknown matcher in {matchers}")
+        self.session.matchers = matchers
+        encoder = ENCODERS[config.get("phonetic", "metaphone")]
+
+        # The phonetic keys are computed when questions are loaded, so
+        # a change of encoding reloads them
+        source_key = (self.get_source_key(filename, filetype)
+                      + (encoder.__name__,))
+        if source_key == self.source_key:
+            self.cap_num_qs()
+            # Rebuilt if the session length changed
+            self.start_quizset_builder()
+        elif background:
+            self.start_store_loader(filename, filetype, encoder, source_key)
         else:
-            LOG.error("Invalid filetype.")
-            raise ValueError
-
+            # Questions are cleaned once here rather than during the game
+            store = QuestionStore(encoder=encoder)
+            store.load(filename, filetype)
+            self.set_store(store, source_key)
+
+    def set_check_threads(self, num_threads):
+        if num_threads == self.check_threads:
+            return
+        self.check_threads = num_threads
+        if self.check_pool is not None:
+            self.check_pool.shutdown(wait=False)
+            self.check_pool = None
+        if num_threads > 1:
+            self.check_pool = ThreadPoolExecutor(
+                max_workers=num_threads, thread_name_prefix="check")
+
+    def set_score_service(self, socket_path):
+        if self.score_service is not None:
+            if self.score_service.socket_path == socket_path:
+                return
+            self.score_service.close()
+            self.score_service = None
+        if socket_path:
+            self.score_service = ScoreClient(socket_path)
+            LOG.info("Using score service at %s", socket_path)
+
+    def set_feed_port(self, port):
+        if self.feed_server is not None:
+            if self.feed_server.server_address[1] == port:
+                return
+            self.feed_server.shutdown()
+            self.feed_server.server_close()
+            self.scores.listeners.remove(self.feed_server.feed)
+            self.feed_server = None
+        if port:
+            feed = ScoreFeed()
+            try:
+                self.feed_server = FeedServer("127.0.0.1", port, feed)
+            except OSError as e:
+                LOG.error("Score feed NOT started! Reason: %s", e)
+                return
+            self.scores.subscribe(feed)
+            self.feed_server.start()
+
+    @staticmethod
+    def get_source_key(filename, filetype):
+        path = f"{filename}.{filetype}"
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (filename, filetype, None, None)
+        return (filename, filetype, stat.st_mtime_ns, stat.st_size)
+
+    def start_store_loader(self, filename, filetype, encoder, source_key):
+        if self.store_loader is not None and self.store_loader.is_alive():
+            LOG.warning("Trivia set reload already in progress.")
+            return
+
+        def load():
+            store = QuestionStore(encoder=encoder)
+            try:
+                store.load(filename, filetype)
+            except (OSError, ValueError) as e:
+                LOG.error("Trivia set NOT reloaded! Reason: %s", e)
+                return
+            self.pending_store = (store, source_key)
+
+        LOG.info("Reloading trivia set in the background...")
+        self.store_loader = threading.Thread(target=load, daemon=True)
+        self.store_loader.start()
+
+    def swap_pending_store(self):
+        """Install a store finished by the background loader. An active
+        session keeps using the store its quizset was built from.
+        """
+        pending, self.pending_store = self.pending_store, None
+        self.set_store(*pending)
+        LOG.info("Trivia set reloaded.")
+        if self.var.gc_freeze:
+            freeze_heap()
+
+    def set_store(self, store, source_key):
+        self.var.store = store
+        self.source_key = source_key
         # Dynamic # of rows based on triviaset
-        self.var.tsrows = self.var.ts.shape[0]
-        # Set columns in quizset to same as triviaset
-        self.session.reset(self.var.ts.columns)
-
+        self.var.tsrows = len(self.var.store)
+        if not self.is_active:
+            self.session.reset(self.var.store)
+        self.cap_num_qs()
+        # A quizset sampled from the old store is rebuilt
+        self.start_quizset_builder()
+
+    def start_quizset_builder(self):
+        """Build the next quizset in the background for the current
+        trivia set and session length, unless one is ready for them. A
+        builder already running picks up the change when it is done.
+        """
+        with self.quizset_lock:
+            self.quizset_wanted = (self.var.store, self.var.num_qs)
+            builder = self.quizset_builder
+            if builder is not None and builder.is_alive():
+                return
+            if self.quizset_is_current(self.next_quizset):
+                return
+            self.next_quizset = None
+            self.quizset_builder = threading.Thread(
+                target=self.run_quizset_builder, daemon=True)
+            self.quizset_builder.start()
+
+    def run_quizset_builder(self):
+        while True:
+            with self.quizset_lock:
+                store, num_qs = self.quizset_wanted
+            quizset = self.session.prepare_quizset(store, num_qs)
+            with self.quizset_lock:
+                if self.quizset_wanted == (store, num_qs):
+                    self.next_quizset = quizset
+                    self.quizset_builder = None
+                    break
+            LOG.info("Trivia set or session length changed, rebuilding "
+                     "the next quizset.")
+        LOG.info("Next quizset pre-built in %.3fs.", quizset.build_time)
+
+    def quizset_is_current(self, quizset):
+        return (quizset is not None and quizset.store is self.var.store
+                and quizset.num_qs == self.var.num_qs)
+
+    def take_quizset(self):
+        """Return the pre-built quizset if it is ready and still matches
+        the trivia set and session length, otherwise None.
+        """
+        with self.quizset_lock:
+            quizset, self.next_quizset = self.next_quizset, None
+        return quizset if self.quizset_is_current(quizset) else None
+
+    def cap_num_qs(self):
         if self.var.tsrows < self.var.num_qs:
             self.var.num_qs = self.var.tsrows
             LOG.warning("Trivia questions for session exceeds trivia set's "
                         "population. Setting session equal to max questions.")
 
     def set_admin_variables(self, config):
-        self.var.ADMINS = config["admins"].split(",")
+        admins = [admin.strip() for admin in config["admins"].split(",")]
+        if not all(admins):
+            raise ValueError(f"Empty admin name in {admins}")
+        self.var.ADMINS = admins
+        # Seconds between memory snapshots, 0 for on request only
+        self.memory.configure(float(config.get("memory_interval", "0")),
+                              self.clock)
+        # Exclude the loaded questions and scores from cyclic GC
+        self.var.gc_freeze = config.get("gc_freeze", "no").lower() in (
+            "yes", "true", "on", "1")
 
     def prepare(self):
         self.load_config()
         self.load_scores()
         self.is_running = (self.chat.is_ready() and self.scores.is_ready()
                            and self.is_ready())
+        if self.is_running and self.var.gc_freeze:
+            freeze_heap()
+        if self.is_running:
+            self.resume_session()
+
+    def save_checkpoint(self):
+        ids = self.session.data
+        store = self.session.store
+        self.checkpoint.save({
+            "questions": ids,
+            "remote": SessionCheckpoint.remote_clues(store, ids),
+            "checksum": SessionCheckpoint.checksum(store, ids),
+            "q_no": self.session.q_no,
+            "hint_req": self.session.hint_req,
+            "hint_order": self.session.hint_order,
+            "question_asked": self.question_asked,
+            "ask_time": self.ask_time,
+            "scores": {user: score[0] for user, score in
+                       self.scores.data.items() if score[0] > 0}})
+
+    def resume_session(self):
+        state = self.checkpoint.load(self.var.store)
+        if state is None:
+            return
+        self.session.data = state["questions"]
+        self.session.q_no = state["q_no"]
+        if not self.session.data or self.session.is_game_over():
+            self.checkpoint.clear()
+            return
+        self.scores.clear()
+        for user, score in state["scores"].items():
+            if user in self.scores.data:
+                self.scores.set_session(user, score)
+        self.session.prepare_question(len(self.var.hint_times))
+        self.session.hint_req = state["hint_req"]
+        if state["hint_order"]:
+            self.session.hint_order = state["hint_order"]
+        self.question_asked = state["question_asked"]
+        self.ask_time = state["ask_time"]
+        self.is_active = True
+        LOG.info("Resumed session at question %d.", self.session.q_no + 1)
+
+    def announce_resume(self):
+        if self.question_asked:
+            self.chat.send_msg(
+                f"Trivia resumed! Question {self.session.q_no + 1}: "
+                f"[{self.session.category()}] {self.session.question()}")
+        else:
+            self.chat.send_msg("Trivia resumed!")
+            self.ask_question()
 
     def stop(self):
         self.is_running = False
+        self.set_check_threads(0)
+        self.set_score_service("")
+        self.set_feed_port(0)
 
     def run(self):
         if self.is_running:
-            try:
-                self.chat.connect()
-                self.chat.send_msg(f"{self.name} v{self.version} loaded!")
-            except (OSError,):
-                LOG.error("Connection failed. Check config file and reboot "
-                          "bot.")
-                self.is_running = False
+            # Messages are queued until the connection is up
+            self.chat.start()
+            self.chat.send_msg(f"{self.name} v{self.version} loaded!")
+            if self.is_active:
+                self.announce_resume()
         else:
             LOG.error("Bot NOT running! Check the errors and reboot bot.")
 
         while self.is_running:
+            if self.pending_store is not None:
+                self.swap_pending_store()
             if self.is_active:
                 self.routine_check()
+            if self.memory.is_due(self.clock.time()):
+                LOG.info(self.memory.snapshot(self.clock.time()))
             self.chat.scanloop()
 
     ###################################################################
@@ -145,18 +465,56 @@ class ChagTriviaBot:
     ###################################################################
     # Interaction code
     ###################################################################
-    def process_message(self, username, message):
+    def process_message(self, username, message, sent_ts=None):
         clean_message = message.strip()
         if message[0] == self.var.PREFIX:
             split_message = clean_message.split(" ")
             if split_message[0][1 :] in self.CMDS:
                 LOG.info("Command recognized.")
                 self.execute_command(split_message, username)
-                time.sleep(1)
-        else:
-            if self.is_active and self.session.check_answer(clean_message):
+                self.clock.sleep(1)
+        elif self.is_active and self.question_asked:
+            is_correct = self.session.check_answer(clean_message)
+            self.record(analytics.GUESS, self.session.last_closeness,
+                        is_correct, self.session.last_stage)
+            if is_correct:
                 LOG.info("Answer recognized.")
-                self.answer_question(username)
+                now = self.clock.time()
+                if sent_ts is None:
+                    sent_ts = int(now * 1000)
+                self.arbiter.submit(username, sent_ts, now)
+                if self.arbiter.is_due(now):
+                    self.close_arbitration()
+
+    def process_messages(self, batch):
+        """Process chat lines received together, in order.
+
+        Parameters
+        ----------
+        batch : list of (str, str, int or None)
+            Username, message and server timestamp of each line.
+        """
+        if (self.check_pool is not None and len(batch) > 1
+                and self.is_active and self.question_asked):
+            # Guesses are scored up front on the pool. If a line in the
+            # batch ends the question, the cache is cleared and the rest
+            # is checked against the next question as usual
+            self.session.warm_guesses(
+                [message for _, message, _ in batch
+                 if message[0] != self.var.PREFIX], self.check_pool)
+        for username, message, sent_ts in batch:
+            self.process_message(username, message, sent_ts)
+
+    def record(self, event, value=0.0, correct=False, stage=""):
+        if not self.var.analytics_dir:
+            return
+        self.recorder.record(self.session.q_no, self.session.question_id(),
+                             event, self.clock.time() - self.session.ask_time,
+                             value, correct, stage)
+
+    def close_arbitration(self):
+        winner, *runners_up = self.arbiter.result(self.var.runners_up)
+        self.answer_question(winner, runners_up)
 
     def execute_command(self, split_message, username):
         command = split_message[0][1 :]
@@ -166,48 +524,105 @@ class ChagTriviaBot:
                 if self.is_active:
                     LOG.info("Trivia already active.")
                 else:
-                    self.start_session()
+                    self.start_session(split_message[1 :])
             elif command == "triviaend" and self.is_active:
                 self.end_session()
             elif command == "stop":
                 self.stop()
             elif command == "loadconfig":
-                self.load_config()
-                self.chat.send_msg("Config reloaded.")
+                if self.reload_config():
+                    self.chat.send_msg("Config reloaded.")
+                else:
+                    self.chat.send_msg("Config NOT reloaded! Check config "
+                                       "file.")
             elif command == "next":
                 self.skip_question()
+            elif command == "memory":
+                self.chat.send_msg(self.memory.snapshot())
+            elif command == "profile":
+                self.start_profile(split_message[1 :])
 
         # GLOBAL COMMANDS
         if command == "score":
             self.get_score(username)
         elif command == "top":
             n = 3
-            if len(split_message) > 1:
-                i = try_parse_int64(split_message[1])
+            args = split_message[1 :]
+            period = None
+            if args and args[0].lower() in PERIODS:
+                period = args.pop(0).lower()
+            if args:
+                i = try_parse_int64(args[0])
                 if i is not None:
                     n = i
-            top = self.scores.get_overall_top(n)
-
-            msg = "No scores yet."
-            if top:
-                msg = " ".join(f"{i + 1}: {score[0]} {score[1]} "
-                               f"{pluralize(score[1], 'match', 'matches')} | "
-                               f"{score[2]} {pluralize(score[2], 'point')}."
-                               for i, score in enumerate(top))
-            self.chat.send_msg(msg)
-
-    def start_session(self):
+            if period is not None:
+                # The day is part of the key since the totals change
+                # when buckets expire
+                day = int(self.clock.time() // DAY)
+                self.chat.send_msg(self.render("top", (period, n, day),
+                                               self.render_period_top))
+            else:
+                self.chat.send_msg(self.render("top", (n,),
+                                               self.render_top))
+
+    def start_profile(self, args):
+        """Sample the main loop for the given number of seconds (30 by
+        default) and write a collapsed stack file to PROFILE_DIR.
+        """
+        seconds = try_parse_int64(args[0]) if args else 30
+        if seconds is None or not 0 < seconds <= 600:
+            self.chat.send_msg("Usage: profile [seconds, up to 600]")
+            return
+        path = os.path.join(
+            PROFILE_DIR, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+        # Commands run on the main loop, so this is the thread to sample
+        if self.sampler.start(threading.get_ident(), seconds, path):
+            self.chat.send_msg(f"Profiling for {seconds} seconds.")
+        else:
+            self.chat.send_msg("A profile is already being taken.")
+
+    def parse_category_mix(self, args):
+        """Parse "<category>[:<weight>], ..." into (category, weight)
+        pairs. Returns None if any category is unknown.
+        """
+        mix = []
+        for part in " ".join(args).split(","):
+            category, _, weight = part.rpartition(":")
+            weight = try_parse_int64(weight)
+            if not category or weight is None:
+                category, weight = part, 1
+            category = category.strip()
+            if not self.var.store.has_category(category) or weight <= 0:
+                self.chat.send_msg(f"Unknown category: {category}")
+                return None
+            mix.append((category, weight))
+        return mix
+
+    def start_session(self, args=()):
+        mix = None
+        if args:
+            mix = self.parse_category_mix(args)
+            if mix is None:
+                return
         self.chat.send_msg("Generating trivia questions for session...")
         self.scores.clear()
+        self.arbiter.reset()
+        # Pick up a trivia set reloaded since the last session
+        self.session.reset(self.var.store)
 
-        # Loop through TS and build QS until num_qs = trivia_numbers
-        self.session.build_quizset(self.var.num_qs, self.var.tsrows,
-                                   self.var.ts)
+        quizset = None if mix else self.take_quizset()
+        if quizset is not None:
+            self.session.use_quizset(quizset)
+        else:
+            LOG.info("No pre-built quizset, building now.")
+            self.session.build_quizset(self.var.num_qs, mix)
+        # The next session's quizset is built while this one is played
+        self.start_quizset_builder()
         self.is_active = True
         self.chat.send_msg(
-            f"Trivia has begun! Question Count: {self.var.num_qs}. "
+            f"Trivia has begun! Question Count: {len(self.session.data)}. "
             f"Trivia will start in {self.var.delay} seconds.")
-        time.sleep(self.var.delay)
+        self.clock.sleep(self.var.delay)
         self.ask_question()
 
     def end_session(self):
@@ -218,8 +633,10 @@ class ChagTriviaBot:
         msg = "No answered questions. Results are blank."
         if top:
             self.chat.send_msg("Trivia is over! Calculating scores...")
-            time.sleep(2)
+            self.clock.sleep(2)
             self.scores.assign_winner(top[0][0])
+            if self.score_service is not None:
+                self.score_service.add(top[0][0], wins=1)
             msg = "*** {} *** is the winner with {} points!".format(*top[0])
             for i, score in enumerate(top):
                 if i > 0:
@@ -227,33 +644,49 @@ class ChagTriviaBot:
                                                              *score)
         self.chat.send_msg(msg)
 
-        self.scores.dump(SCORES_PATH)
-        time.sleep(3)
+        # The score service owns the totals, and bots sharing it would
+        # race on the local file
+        if self.score_service is None:
+            self.scores.dump(SCORES_PATH)
+        self.scores.dump_periods(PERIODS_PATH)
+        self.clock.sleep(3)
         self.chat.send_msg("Thanks for playing! See you next time!")
 
         # reset variables for trivia
         self.is_active = False
         self.question_asked = False
         self.ask_time = 0
-        self.session.reset(self.var.ts.columns)
+        # Answers collected for a question the session ended on
+        self.arbiter.reset()
+        self.session.reset(self.var.store)
+        self.checkpoint.clear()
+        if self.var.analytics_dir:
+            path = self.recorder.flush(self.var.analytics_dir)
+            LOG.info("Session analytics written to %s", path)
+        self.recorder.clear()
 
     def ask_question(self):
         self.question_asked = True
-        self.ask_time = round(time.time())
+        self.ask_time = round(self.clock.time())
 
         q_no = self.session.q_no + 1
+        self.session.prepare_question(len(self.var.hint_times))
         self.chat.send_msg(f"Question {q_no}: [{self.session.category()}] "
                            f"{self.session.question()}")
 
         LOG.info("Question %d: %s | ANSWER: %s", q_no,
                  self.session.question(), self.session.answer())
+        self.record(analytics.ASKED)
+        self.save_checkpoint()
 
     def prepare_next_question(self):
         self.question_asked = False
         self.ask_time = 0
+        self.arbiter.reset()
         self.session.prepare_next_question()
+        self.save_checkpoint()
 
-    def answer_question(self, username):
+    def award_point(self, username):
         try:
             self.scores.user_add("session", username)
             self.scores.user_add("overall", username)
@@ -261,18 +694,33 @@ class ChagTriviaBot:
             LOG.warning("Failed to find user! Adding new")
             # sets up new user
             self.scores.create_user(username)
-        # Save all current scores
-        self.scores.dump(SCORES_PATH)
+        self.scores.period_add(username, self.clock.time())
+        if self.score_service is not None:
+            self.score_service.add(username, points=1)
+
+    def answer_question(self, username, runners_up=()):
+        self.record(analytics.ANSWERED, 1 + len(runners_up), True)
+        self.award_point(username)
+        for runner_up in runners_up:
+            self.award_point(runner_up)
+        # Save all current scores. With a score service the totals are
+        # persisted there and the local file is not written, while the
+        # period scores are only written at the end of the session
+        if self.score_service is None:
+            self.scores.dump(SCORES_PATH)
+            self.scores.dump_periods(PERIODS_PATH)
         self.chat.send_msg(
             f"{username} answers question #{self.session.q_no + 1} "
             f"correctly {self.var.correct} The answer is ** "
             f"{self.session.answer()} ** {username} has "
             f"{self.scores.get_session(username)} "
             f"{pluralize(self.scores.get_session(username), 'point')}!")
-        time.sleep(self.var.delay)
+        if runners_up:
+            self.chat.send_msg(f"Also correct: {', '.join(runners_up)}")
+        self.clock.sleep(self.var.delay)
         self.prepare_next_question()
 
-        if self.session.is_game_over(self.var.num_qs):
+        if self.session.is_game_over():
             self.end_session()
         else:
             LOG.info("Next question called...")
@@ -282,9 +730,12 @@ class ChagTriviaBot:
         hint = self.session.ask_hint(hint_type)
         if hint is not None:
             self.chat.send_msg(f"Hint #{hint_type}: {hint}")
+            self.record(analytics.HINT, hint_type)
+            self.save_checkpoint()
 
     def skip_question(self):
         if self.is_active:
+            self.record(analytics.SKIPPED)
             try:
                 self.chat.send_msg(
                     f"Question was not answered in time {self.var.wrong} "
@@ -295,32 +746,85 @@ class ChagTriviaBot:
                     f"Question was not answered in time {self.var.wrong} "
                     "Skipping to next question")
             self.prepare_next_question()
-            time.sleep(self.var.delay)
+            self.clock.sleep(self.var.delay)
 
-            if self.session.is_game_over(self.var.num_qs):
+            if self.session.is_game_over():
                 self.end_session()
             else:
                 self.ask_question()
 
     def get_score(self, username):
+        self.chat.send_msg(self.render("score", (username,),
+                                       self.render_score))
+
+    def render(self, command, args, renderer):
+        """Return the reply for `command`, only re-rendering it when the
+        scores have changed since it was last rendered, or with a score
+        service, also every SERVICE_CACHE_TTL seconds.
+        """
+        epoch = None
+        if self.score_service is not None:
+            epoch = int(self.clock.time() // self.SERVICE_CACHE_TTL)
+        key = (command, args, self.scores.version, epoch)
+        msg = self.render_cache.get(key)
+        if msg is None:
+            msg = renderer(*args)
+            self.render_cache.put(key, msg)
+        return msg
+
+    def render_top(self, n):
+        top = None
+        if self.score_service is not None:
+            top = self.score_service.top(n)
+        if top is None:
+            top = self.scores.get_overall_top(n)
+        if not top:
+            return "No scores yet."
+        return " ".join(f"{i + 1}: {score[0]} {score[1]} "
+                        f"{pluralize(score[1], 'match', 'matches')} | "
+                        f"{score[2]} {pluralize(score[2], 'point')}."
+                        for i, score in enumerate(top))
+
+    def render_period_top(self, period, n, day):
+        top = self.scores.get_period_top(period, n, self.clock.time())
+        if not top:
+            return f"No scores in the past {period}."
+        return f"Top of the past {period}: " + " ".join(
+            f"{i + 1}: {user} {points} {pluralize(points, 'point')}."
+            for i, (user, points) in enumerate(top))
+
+    def render_score(self, username):
+        totals = None
+        if self.score_service is not None:
+            totals = self.score_service.stats(username)
         try:
-            self.chat.send_msg(
-                "{} has {} points for this trivia session, {} total points "
-                "and {} total wins.".format(username,
-                                            *self.scores.data[username]))
+            score = self.scores.data[username]
+            session = score[0]
+            if totals is None:
+                totals = score[1 :]
         except KeyError:
-            self.chat.send_msg(f"{username} not found in database.")
+            if totals is None:
+                return f"{username} not found in database."
+            session = 0
+        return ("{} has {} points for this trivia session, {} total "
+                "points and {} total wins.".format(username, session,
+                                                   *totals))
 
     def routine_check(self):
-        self.timer = round(time.time())
+        if self.arbiter.is_due(self.clock.time()):
+            # May end the session through answer_question
+            self.close_arbitration()
+            return
+        self.timer = round(self.clock.time())
 
-        if self.session.is_game_over(self.var.num_qs):
+        if self.is_active and self.session.is_game_over():
             self.end_session()
 
         if self.is_active and self.question_asked:
             if self.exceed_time(self.var.skip_time):
                 self.skip_question()
-            elif self.exceed_time(self.var.hint_time_2):
-                self.ask_hint(2)
-            elif self.exceed_time(self.var.hint_time_1):
-                self.ask_hint(1)
+                return
+            for hint_type in range(len(self.var.hint_times), 0, -1):
+                if self.exceed_time(self.var.hint_times[hint_type - 1]):
+                    self.ask_hint(hint_type)
+                    break
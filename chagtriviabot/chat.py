@@ -1,24 +1,49 @@
+from collections import deque
 import logging
-import re
+import random
 import socket
-import time
+
+from chagtriviabot.ircmessage import IrcMessage, split_lines
 
 LOG = logging.getLogger("Chat")
 
 class Chat:
     # RATE = 20 / 30  # message rate limit
     RATE = 120  # message rate limit
-    CHAT_MSG = re.compile(r"^:\w+!\w+@\w+\.tmi\.twitch\.tv PRIVMSG #\w+ :")
+    # Seconds without any data before we PING the server, and seconds to
+    # wait for any reply to that PING before reconnecting
+    PING_INTERVAL = 300
+    PING_TIMEOUT = 30
+    # Reconnect delays grow as BACKOFF_BASE * 2 ** attempt up to
+    # BACKOFF_MAX, with full jitter
+    BACKOFF_BASE = 1
+    BACKOFF_MAX = 120
+    # Messages kept for sending while disconnected
+    OUTBOX_SIZE = 100
+    # Seconds to wait for the server to accept the connection and the
+    # login lines
+    CONNECT_TIMEOUT = 10
 
     def __init__(self, bot):
         self.bot = bot
-        self.socket = socket.socket()
+        self.socket = None
         self.HOST = None
         self.PORT = None
         self.NICK = None
         self.PASS = None
         self.CHAN = None
         self.is_loaded = False
+        # Received bytes not yet split into complete lines
+        self.buffer = bytearray()
+        # Connection supervision
+        self.is_connected = False
+        self.outbox = deque()
+        # Bytes of the first queued line already sent
+        self.sent = 0
+        self.last_recv = 0
+        self.ping_sent = None
+        self.attempts = 0
+        self.next_attempt = 0
 
     def is_bot(self, username):
         return username.lower() == self.NICK.lower()
@@ -39,33 +64,162 @@ class Chat:
             self.is_loaded = False
 
     def connect(self):
-        self.socket.connect((self.HOST, self.PORT))
-        self.socket.send(f"PASS {self.PASS}\r\n".encode("utf-8"))
-        self.socket.send(f"NICK {self.NICK}\r\n".encode("utf-8"))
-        self.socket.send(f"JOIN {self.CHAN}\r\n".encode("utf-8"))
-        time.sleep(1)
+        # A socket cannot be reused once closed, so always start afresh
+        self.close()
+        self.socket = socket.create_connection((self.HOST, self.PORT),
+                                               timeout=self.CONNECT_TIMEOUT)
+        self.socket.sendall(f"PASS {self.PASS}\r\n".encode("utf-8"))
+        self.socket.sendall(f"NICK {self.NICK}\r\n".encode("utf-8"))
+        self.socket.sendall(b"CAP REQ :twitch.tv/tags\r\n")
+        self.socket.sendall(f"JOIN {self.CHAN}\r\n".encode("utf-8"))
+        self.bot.clock.sleep(1)
         self.socket.setblocking(0)
+        self.buffer.clear()
+        # A line cut off by the old connection is sent again in full
+        self.sent = 0
+        self.is_connected = True
+        self.last_recv = self.bot.clock.time()
+        self.ping_sent = None
+        self.flush()
+
+    def close(self):
+        self.is_connected = False
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+            self.socket = None
+
+    def disconnect(self, reason):
+        LOG.warning("Connection lost (%s). Reconnecting...", reason)
+        self.close()
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self):
+        delay = random.uniform(0, min(self.BACKOFF_MAX,
+                                      self.BACKOFF_BASE * 2 ** self.attempts))
+        self.attempts += 1
+        self.next_attempt = self.bot.clock.time() + delay
+        LOG.info("Reconnect attempt %d in %.1f seconds.", self.attempts,
+                 delay)
+
+    def start(self):
+        """Make the first connection, falling back to the reconnect
+        backoff if it fails.
+        """
+        try:
+            self.connect()
+        except OSError as e:
+            LOG.warning("Connection failed: %s", e)
+            self.close()
+            self.schedule_reconnect()
+
+    def try_reconnect(self):
+        if self.bot.clock.time() < self.next_attempt:
+            return
+        try:
+            self.connect()
+            LOG.info("Reconnected.")
+        except OSError as e:
+            LOG.warning("Reconnect failed: %s", e)
+            self.close()
+            self.schedule_reconnect()
 
     # Chat message sender func
     def send_msg(self, msg):
-        self.socket.send(
+        if len(self.outbox) >= self.OUTBOX_SIZE:
+            # Drop the oldest message, unless it is partly sent
+            del self.outbox[1 if self.sent else 0]
+        self.outbox.append(
             ":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG {1} : {2}\r\n".format(
                 self.NICK, self.CHAN, msg).encode("utf-8"))
+        if self.is_connected:
+            self.flush()
+
+    def send_command(self, line):
+        """Queue a server command ahead of the chat messages and send
+        it.
+        """
+        self.outbox.insert(1 if self.sent else 0, line)
+        self.flush()
+
+    def flush(self):
+        """Send queued lines in order. Lines stay queued if the socket
+        is busy or the connection drops, and a line the socket only
+        took part of is resumed from where it stopped.
+        """
+        while self.outbox and self.is_connected:
+            line = self.outbox[0]
+            try:
+                self.sent += self.socket.send(memoryview(line)[self.sent :])
+            except BlockingIOError:
+                return
+            except OSError as e:
+                self.disconnect(e)
+                return
+            if self.sent < len(line):
+                return
+            self.outbox.popleft()
+            self.sent = 0
+
+    def check_health(self):
+        now = self.bot.clock.time()
+        if self.ping_sent is not None:
+            if now - self.ping_sent > self.PING_TIMEOUT:
+                self.disconnect("ping timeout")
+        elif now - self.last_recv > self.PING_INTERVAL:
+            self.ping_sent = now
+            self.send_command(b"PING :tmi.twitch.tv\r\n")
 
     def scanloop(self):
         try:
-            response = self.socket.recv(1024).decode("utf-8")
-            if response == "PING :tmi.twitch.tv\r\n":
-                self.socket.send("PONG :tmi.twitch.tv\r\n".encode("utf-8"))
-                LOG.info("Pong sent")
+            if not self.is_connected:
+                self.try_reconnect()
                 return
-            username = re.search(r"\w+", response).group(0)
-            if self.is_bot(username):
+            if self.outbox:
+                self.flush()
+            data = self.socket.recv(1024)
+            if not data:
+                self.disconnect("closed by server")
                 return
-            message = self.CHAT_MSG.sub("", response)
-            LOG.info("USER RESPONSE: %s : %s", username, message)
-            self.bot.process_message(username, message)
-        except (BlockingIOError, AttributeError, UnicodeDecodeError):
-            pass
+            self.last_recv = self.bot.clock.time()
+            self.ping_sent = None
+            # Only a connection which delivers data resets the backoff
+            self.attempts = 0
+            self.buffer += data
+            batch = []
+            for line in split_lines(self.buffer):
+                self.handle_line(IrcMessage(line), batch)
+                if not self.is_connected:
+                    break
+            if batch:
+                self.bot.process_messages(batch)
+        except BlockingIOError:
+            self.check_health()
+        except OSError as e:
+            self.disconnect(e)
         finally:
-            time.sleep(1 / self.RATE)
+            self.bot.clock.sleep(1 / self.RATE)
+
+    def handle_line(self, msg, batch):
+        """Handle server commands and add chat messages to `batch`."""
+        command = msg.command
+        if command == b"PING":
+            self.send_command(f"PONG :{msg.trailing}\r\n".encode("utf-8"))
+            LOG.info("Pong sent")
+        elif command == b"RECONNECT":
+            self.disconnect("server requested reconnect")
+        elif command == b"PRIVMSG":
+            username = msg.nick
+            if not username or self.is_bot(username):
+                return
+            message = msg.trailing
+            if not message:
+                return
+            LOG.info("USER RESPONSE: %s : %s", username, message,
+                     extra={"sample": "response"})
+            sent_ts = msg.tag("tmi-sent-ts")
+            batch.append(
+                (username, message,
+                 int(sent_ts) if sent_ts and sent_ts.isdigit() else None))
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import zlib
+
+LOG = logging.getLogger("Checkpoint")
+
+class SessionCheckpoint:
+    """Snapshot of an in-progress trivia session, rewritten atomically
+    on each state transition so a restarted bot can pick the game up
+    where it stopped.
+
+    The quizset is saved as question ids together with a checksum of
+    their answers, which is used to check that the ids still point to
+    the same questions when the triviaset is reloaded. Remote clues are
+    only in the store while the bot runs, so their text is saved as
+    well and they are added back on load.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def checksum(store, ids):
+        return zlib.crc32("\0".join(store.answer(qid)
+                                    for qid in ids).encode("utf-8"))
+
+    @staticmethod
+    def remote_clues(store, ids):
+        """Return [position, category, question, answer] of each
+        question in `ids` which did not come from the loaded file.
+        """
+        return [[i, store.category(qid), store.question(qid),
+                 store.answer(qid)]
+                for i, qid in enumerate(ids) if qid >= store.num_local]
+
+    def save(self, state):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as checkpoint:
+                json.dump(state, checkpoint, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            LOG.error("Checkpoint NOT saved! Reason: %s", e)
+
+    def load(self, store):
+        """Read the checkpoint, returning None if there is none or if
+        it does not match the questions in `store`.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as checkpoint:
+                state = json.load(checkpoint)
+            ids = state["questions"]
+            for i, category, question, answer in state.get("remote", []):
+                added = store.add_many([category], [question], [answer])
+                if not added:
+                    LOG.warning("Checkpoint remote clue could not be "
+                                "restored, discarding.")
+                    return None
+                ids[i] = added[0]
+            if (any(qid >= len(store) for qid in ids)
+                    or self.checksum(store, ids) != state["checksum"]):
+                LOG.warning("Checkpoint does not match the trivia set, "
+                            "discarding.")
+                return None
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            LOG.error("Checkpoint NOT loaded! Reason: %s", e)
+            return None
+        return state
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
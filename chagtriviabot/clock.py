@@ -0,0 +1,27 @@
+import time
+
+class Clock:
+    """Wall-clock time source used by the bot for timers and delays."""
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class SimulatedClock(Clock):
+    """Virtual time source. Sleeping advances the clock instantly, so a
+    whole game can be played without waiting.
+
+    Parameters
+    ----------
+    start : float, optional
+        Initial time in seconds.
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -0,0 +1,125 @@
+"""
+.. module:: dedup
+   :synopsis: Duplicate question detection
+"""
+import hashlib
+import zlib
+
+import numpy as np
+
+from chagtriviabot.aliases import normalize_answer
+
+class MinHasher:
+    """MinHash signatures over character shingles, for estimating the
+    Jaccard similarity of two texts.
+
+    Parameters
+    ----------
+    num_perm : int, optional
+        Number of hash permutations, i.e. the signature length.
+    shingle_size : int, optional
+        Length of the character shingles.
+    seed : int, optional
+        Seed for the permutation coefficients, so signatures are
+        comparable between runs.
+    """
+    PRIME = 4294967291  # largest prime below 2 ** 32
+
+    def __init__(self, num_perm=32, shingle_size=4, seed=1):
+        rng = np.random.RandomState(seed)
+        # a < 2 ** 31 and shingle hashes < 2 ** 32 so a * x + b cannot
+        # overflow uint64
+        self._a = rng.randint(1, 2 ** 31, size=(num_perm, 1),
+                              dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31, size=(num_perm, 1),
+                              dtype=np.int64).astype(np.uint64)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        """Compute the MinHash signature of `text`.
+
+        Returns
+        -------
+        numpy.ndarray
+            `num_perm` unsigned integers.
+        """
+        k = self.shingle_size
+        shingles = {text[i : i + k]
+                     for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8"))
+                              for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return (((self._a * hashes + self._b) % self.PRIME).min(axis=1)
+                .astype(np.uint32))
+
+class DuplicateIndex:
+    """Detects exact and near duplicate questions as they are added.
+
+    Exact duplicates share a digest of their normalized question and
+    answer. Near duplicates have the same normalized answer and an
+    estimated question Jaccard similarity of at least `threshold`.
+    Candidates are found by locality sensitive hashing of the MinHash
+    signature in `bands`, so each check only looks at a few questions.
+
+    Parameters
+    ----------
+    threshold : float, optional
+        Minimum estimated Jaccard similarity for a near duplicate.
+    bands : int, optional
+        Number of LSH bands the signature is split into.
+    rows : int, optional
+        Number of signature values per band.
+
+    Attributes
+    ----------
+    exact : int
+        Number of exact duplicates rejected.
+    near : int
+        Number of near duplicates rejected.
+    """
+    def __init__(self, threshold=0.7, bands=8, rows=4):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(num_perm=bands * rows)
+        self.exact = 0
+        self.near = 0
+        self._digests = set()
+        self._buckets = {}
+        self._signatures = []
+
+    def add(self, question, answer):
+        """Index a question unless it duplicates one already indexed.
+
+        Returns
+        -------
+        bool
+            True if the question was added, False if it is a duplicate.
+        """
+        question = normalize_answer(question)
+        answer = normalize_answer(answer)
+        digest = hashlib.blake2b(f"{question}\0{answer}".encode("utf-8"),
+                                 digest_size=16).digest()
+        if digest in self._digests:
+            self.exact += 1
+            return False
+
+        signature = self.hasher.signature(question)
+        keys = [hash((answer, band, signature[band * self.rows :
+                                              (band + 1) * self.rows]
+                      .tobytes()))
+                for band in range(self.bands)]
+        for key in keys:
+            for other in self._buckets.get(key, ()):
+                similarity = np.mean(signature == self._signatures[other])
+                if similarity >= self.threshold:
+                    self.near += 1
+                    return False
+
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        self._digests.add(digest)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(idx)
+        return True
@@ -3,6 +3,7 @@
    :synopsis: Module for edit distance algorithms.
 """
 from enum import Enum
+import threading
 
 import numpy as np
 
@@ -66,9 +67,33 @@ class EditDistance(object):
                                                 max_distance)
 
 class AbstractDistanceComparer(object):
-    """An interface to compute relative distance between two strings"""
+    """An interface to compute relative distance between two strings
+
+    Attributes
+    ----------
+    _local : threading.local
+        Per-thread scratch buffers, used when `is_thread_safe` is set.
+    """
     def __init__(self, is_thread_safe):
         self.is_thread_safe = is_thread_safe
+        self._local = threading.local()
+        self._shared = {}
+
+    def _buffers(self, length, count):
+        """Return `count` int32 scratch buffers of at least `length`
+        elements, followed by a read-only ramp 1, 2, ... of the same
+        size which the kernels initialize them from. Buffers are reused
+        between calls and only grow, per thread when `is_thread_safe` is
+        set and per instance otherwise.
+        """
+        pool = self._local.__dict__ if self.is_thread_safe else self._shared
+        buffers = pool.get("buffers")
+        if buffers is None or len(buffers[0]) < length:
+            buffers = [np.zeros(length, dtype=np.int32)
+                       for _ in range(count)]
+            buffers.append(np.arange(1, length + 1, dtype=np.int32))
+            pool["buffers"] = buffers
+        return buffers
 
     def distance(self, string_1, string_2, max_distance):
         """Return a measure of the distance between two strings.
@@ -100,15 +125,7 @@ class AbstractDistanceComparer(object):
 class Levenshtein(AbstractDistanceComparer):
     """Class providing Levenshtein algorithm for computing edit
     distance metric between two strings
-
-    Attributes
-    ----------
-    _base_char_1_costs : numpy.ndarray
     """
-    def __init__(self, is_thread_safe):
-        super().__init__(is_thread_safe)
-        self._base_char_1_costs = np.zeros(0, dtype=np.int32)
-
     def distance(self, string_1, string_2, max_distance):
         """Compute and return the Levenshtein edit distance between two
         strings.
@@ -149,30 +166,22 @@ class Levenshtein(AbstractDistanceComparer):
         if len_1 == 0:
             return len_2 if len_2 <= max_distance else -1
 
-        if self.is_thread_safe:
-            if max_distance < len_2:
-                return self._distance_max(string_1, string_2, len_1, len_2,
-                                          start, max_distance,
-                                          np.zeros(len_2, dtype=np.int32))
-            return self._distance(string_1, string_2, len_1, len_2, start,
-                                  np.zeros(len_2, dtype=np.int32))
-        else:
-            if len_2 > len(self._base_char_1_costs):
-                self._base_char_1_costs = np.zeros(len_2, dtype=np.int32)
-            if max_distance < len_2:
-                return self._distance_max(string_1, string_2, len_1, len_2,
-                                          start, max_distance,
-                                          self._base_char_1_costs)
-            return self._distance(string_1, string_2, len_1, len_2, start,
-                                  self._base_char_1_costs)
+        char_1_costs, ramp = self._buffers(len_2, 1)
+        if max_distance < len_2:
+            return self._distance_max(string_1, string_2, len_1, len_2,
+                                      start, max_distance, char_1_costs,
+                                      ramp)
+        return self._distance(string_1, string_2, len_1, len_2, start,
+                              char_1_costs, ramp)
 
     @staticmethod
-    def _distance(string_1, string_2, len_1, len_2, start, char_1_costs):
+    def _distance(string_1, string_2, len_1, len_2, start, char_1_costs,
+                  ramp):
         """Internal implementation of the core Levenshtein algorithm.
 
         **From**: https://github.com/softwx/SoftWx.Match
         """
-        char_1_costs = np.asarray([j + 1 for j in range(len_2)])
+        np.copyto(char_1_costs[: len_2], ramp[: len_2])
         current_cost = 0
         for i in range(len_1):
             left_char_cost = above_char_cost = i
@@ -194,15 +203,14 @@ class Levenshtein(AbstractDistanceComparer):
 
     @staticmethod
     def _distance_max(string_1, string_2, len_1, len_2, start, max_distance,
-                      char_1_costs):
+                      char_1_costs, ramp):
         """Internal implementation of the core Levenshtein algorithm
         that accepts a max_distance.
 
         **From**: https://github.com/softwx/SoftWx.Match
         """
-        char_1_costs = np.asarray([j + 1 if j < max_distance
-                                   else max_distance + 1
-                                   for j in range(len_2)])
+        np.minimum(ramp[: len_2], max_distance + 1,
+                   out=char_1_costs[: len_2])
         len_diff = len_2 - len_1
         j_start_offset = max_distance - len_diff
         j_start = 0
@@ -238,18 +246,7 @@ class DamerauOsa(AbstractDistanceComparer):
     """Class providing optimized methods for computing
     Damerau-Levenshtein Optimal String Alignment (OSA) comparisons
     between two strings.
-
-    Attributes
-    ----------
-    _base_char_1_costs : numpy.ndarray
-    _base_prev_char_1_costs : numpy.ndarray
-
     """
-    def __init__(self, is_thread_safe):
-        super().__init__(is_thread_safe)
-        self._base_char_1_costs = np.zeros(0, dtype=np.int32)
-        self._base_prev_char_1_costs = np.zeros(0, dtype=np.int32)
-
     def distance(self, string_1, string_2, max_distance):
         """Compute and return the Damerau-Levenshtein optimal string
         alignment edit distance between two strings.
@@ -290,37 +287,23 @@ class DamerauOsa(AbstractDistanceComparer):
         if len_1 == 0:
             return len_2 if len_2 <= max_distance else -1
 
-        if self.is_thread_safe:
-            if max_distance < len_2:
-                return self._distance_max(string_1, string_2, len_1, len_2,
-                                          start, max_distance,
-                                          np.zeros(len_2, dtype=np.int32),
-                                          np.zeros(len_2, dtype=np.int32))
-            return self._distance(string_1, string_2, len_1, len_2, start,
-                                  np.zeros(len_2, dtype=np.int32),
-                                  np.zeros(len_2, dtype=np.int32))
-        else:
-            if len_2 > len(self._base_char_1_costs):
-                self._base_char_1_costs = np.zeros(len_2, dtype=np.int32)
-                self._base_prev_char_1_costs = np.zeros(len_2, dtype=np.int32)
-            if max_distance < len_2:
-                return self._distance_max(string_1, string_2, len_1, len_2,
-                                          start, max_distance,
-                                          self._base_char_1_costs,
-                                          self._base_prev_char_1_costs)
-            return self._distance(string_1, string_2, len_1, len_2, start,
-                                  self._base_char_1_costs,
-                                  self._base_prev_char_1_costs)
+        char_1_costs, prev_char_1_costs, ramp = self._buffers(len_2, 2)
+        if max_distance < len_2:
+            return self._distance_max(string_1, string_2, len_1, len_2,
+                                      start, max_distance, char_1_costs,
+                                      prev_char_1_costs, ramp)
+        return self._distance(string_1, string_2, len_1, len_2, start,
+                              char_1_costs, prev_char_1_costs, ramp)
 
     @staticmethod
     def _distance(string_1, string_2, len_1, len_2, start, char_1_costs,
-                  prev_char_1_costs):
+                  prev_char_1_costs, ramp):
         """Internal implementation of the core Damerau-Levenshtein,
         optimal string alignment algorithm.
 
         **From**: https://github.com/softwx/SoftWx.Match
         """
-        char_1_costs = np.asarray([j + 1 for j in range(len_2)])
+        np.copyto(char_1_costs[: len_2], ramp[: len_2])
         char_1 = " "
         current_cost = 0
         for i in range(len_1):
@@ -357,15 +340,14 @@ class DamerauOsa(AbstractDistanceComparer):
 
     @staticmethod
     def _distance_max(string_1, string_2, len_1, len_2, start, max_distance,
-                      char_1_costs, prev_char_1_costs):
+                      char_1_costs, prev_char_1_costs, ramp):
         """Internal implementation of the core Damerau-Levenshtein,
         optimal string alignment algorithm that accepts a max_distance.
 
         **From**: https://github.com/softwx/SoftWx.Match
         """
-        char_1_costs = np.asarray([j + 1 if j < max_distance
-                                   else max_distance + 1
-                                   for j in range(len_2)])
+        np.minimum(ramp[: len_2], max_distance + 1,
+                   out=char_1_costs[: len_2])
         len_diff = len_2 - len_1
         j_start_offset = max_distance - len_diff
         j_start = 0
@@ -2,9 +2,17 @@
 .. module:: helpers
    :synopsis: Helper functions
 """
+from collections import OrderedDict
 from difflib import SequenceMatcher
+from functools import lru_cache
+import html
 from itertools import zip_longest
 import re
+import threading
+
+# Words which cost nothing to leave unpaired when aligning answer and
+# guess tokens, so "the beatles" still matches "beatles"
+FREE_TOKENS = frozenset(["the", "a", "an"])
 
 def replace_multiple_substring(replacement, string):
     """Replace multiple substrings in one pass
@@ -14,10 +22,15 @@ def replace_multiple_substring(replacement, string):
     string -- the original string which contains the substrings that
         need replacing
     """
-    replacement = dict((re.escape(key), val)
-                       for key, val in replacement.items())
-    pattern = re.compile("|".join(replacement.keys()))
-    return pattern.sub(lambda m: replacement[re.escape(m.group(0))], string)
+    pattern = _substring_pattern(tuple(replacement.keys()))
+    return pattern.sub(lambda m: replacement[m.group(0)], string)
+
+@lru_cache(maxsize=32)
+def _substring_pattern(keys):
+    """Compile (once per set of keys) the alternation used by
+    :func:`replace_multiple_substring`
+    """
+    return re.compile("|".join(re.escape(key) for key in keys))
 
 def pluralize(count, singular, plural=None):
     if plural is not None:
@@ -107,6 +120,45 @@ def to_similarity(distance, length):
     """
     return -1 if distance < 0 else 1.0 - distance / length
 
+def gap_costs(tokens):
+    """Return the cost of leaving each token unpaired: 0 for
+    :data:`FREE_TOKENS`, 1 otherwise. If every token is free they all
+    cost 1, so an answer such as "The The" still has to be matched.
+    """
+    costs = [0 if token in FREE_TOKENS else 1 for token in tokens]
+    return costs if any(costs) else [1] * len(tokens)
+
+def align_tokens(gaps_1, gaps_2, pair_cost):
+    """Calculate the cost of the cheapest monotone alignment of two
+    token sequences.
+
+    Parameters
+    ----------
+    gaps_1 : list of int
+        Cost of leaving each token of the first sequence unpaired.
+    gaps_2 : list of int
+        Cost of leaving each token of the second sequence unpaired.
+    pair_cost : function
+        Called with token indices (i, j), returns the cost of pairing
+        token i of the first sequence with token j of the second one,
+        from 0 to 1.
+
+    Returns
+    -------
+    float
+        The total cost of the alignment.
+    """
+    prev_costs = [0]
+    for gap in gaps_2:
+        prev_costs.append(prev_costs[-1] + gap)
+    for i, gap_1 in enumerate(gaps_1):
+        costs = [prev_costs[0] + gap_1]
+        for j, gap_2 in enumerate(gaps_2):
+            costs.append(min(prev_costs[j] + pair_cost(i, j),
+                             prev_costs[j + 1] + gap_1, costs[j] + gap_2))
+        prev_costs = costs
+    return prev_costs[-1]
+
 def try_parse_int64(string):
     """Converts the string representation of a number to its 64-bit
     signed integer equivalent.
@@ -363,3 +415,109 @@ class DictIO:
 
     def __next__(self):
         return "{0}{2}{1}".format(*(next(self.iteritems) + (self.separator,)))
+
+class TextNormalizer:
+    """A precompiled cleaning pipeline for question text. Strips HTML
+    tags, decodes HTML entities, unescapes backslash-escaped quotes,
+    removes `strip_chars` and collapses runs of whitespace. Unescaped
+    quotes are kept, as they are part of many local questions.
+
+    Parameters
+    ----------
+    strip_chars : str, optional
+        Characters removed from the text entirely, none by default.
+    """
+    HTML_TAG = re.compile(r"<[^<>]*>")
+    ESCAPED_QUOTE = re.compile(r"\\(['\"])")
+    WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, strip_chars=""):
+        self._strip_table = str.maketrans("", "", strip_chars)
+
+    def __call__(self, text):
+        """Return the cleaned version of `text`. Non-string values
+        (e.g. missing cells) are cleaned to an empty string.
+        """
+        if not isinstance(text, str):
+            return ""
+        text = self.HTML_TAG.sub("", text)
+        text = html.unescape(text)
+        text = self.ESCAPED_QUOTE.sub(r"\1", text)
+        text = text.translate(self._strip_table)
+        return self.WHITESPACE.sub(" ", text).strip()
+
+    def normalize_all(self, texts):
+        """Clean an iterable of strings in bulk.
+
+        Parameters
+        ----------
+        texts : iterable of str
+            The strings to clean.
+
+        Returns
+        -------
+        list of str
+            The cleaned strings, in the same order.
+        """
+        return [self(text) for text in texts]
+
+class LRUCache:
+    """A bounded mapping which evicts the least recently used entry
+    once `maxsize` is exceeded.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of entries held by the cache.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups that found an entry.
+    misses : int
+        Number of lookups that did not find an entry.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        # Guesses may be scored from worker threads
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value for `key` and mark it as most recently
+        used, or `default` if `key` is not cached.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Insert or update `key`, evicting the least recently used
+        entry if the cache is full.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._data.clear()
+        self.hits = 0
+        self.misses = 0
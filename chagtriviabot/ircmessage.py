@@ -0,0 +1,189 @@
+"""
+.. module:: ircmessage
+   :synopsis: Lazy IRC message parser with IRCv3 tags
+"""
+TAG_ESCAPES = {"\\:": ";", "\\s": " ", "\\\\": "\\", "\\r": "\r",
+               "\\n": "\n"}
+
+def unescape_tag(value):
+    """Decode the escape sequences in an IRCv3 tag value"""
+    if "\\" not in value:
+        return value
+    out = []
+    i = 0
+    while i < len(value):
+        pair = value[i : i + 2]
+        if pair in TAG_ESCAPES:
+            out.append(TAG_ESCAPES[pair])
+            i += 2
+        else:
+            # a lone backslash is dropped
+            if value[i] != "\\":
+                out.append(value[i])
+            i += 1
+    return "".join(out)
+
+def split_lines(buffer):
+    """Split complete CRLF terminated lines off the front of `buffer`.
+
+    Parameters
+    ----------
+    buffer : bytearray
+        Received data. Complete lines are removed from it in place, a
+        trailing partial line is left for the next read.
+
+    Returns
+    -------
+    list of bytes
+        The complete lines without their line endings.
+    """
+    end = buffer.rfind(b"\r\n")
+    if end < 0:
+        return []
+    lines = bytes(buffer[: end]).split(b"\r\n")
+    del buffer[: end + 2]
+    return lines
+
+class IrcMessage:
+    """A single IRC line, parsed on demand.
+
+    Only the offsets of the tags, prefix, command and parameters are
+    located when a field is first accessed. Fields are sliced out of the
+    raw line and decoded individually, so a handler pays only for the
+    fields it reads.
+
+    Parameters
+    ----------
+    line : bytes
+        One IRC line without the trailing CRLF.
+    """
+    __slots__ = ("line", "_tags_end", "_prefix", "_command",
+                 "_params_start", "_tags")
+
+    def __init__(self, line):
+        self.line = line
+        self._command = None
+        self._tags = None
+
+    def _parse(self):
+        line = self.line
+        pos = 0
+        self._tags_end = 0
+        if line.startswith(b"@"):
+            pos = line.find(b" ") + 1
+            self._tags_end = pos - 1
+        self._prefix = None
+        if line.startswith(b":", pos):
+            end = line.find(b" ", pos)
+            self._prefix = (pos + 1, end)
+            pos = end + 1
+        end = line.find(b" ", pos)
+        if end < 0:
+            end = len(line)
+        self._command = line[pos : end]
+        self._params_start = end + 1
+
+    @property
+    def command(self):
+        """The command, e.g. b"PRIVMSG", as bytes."""
+        if self._command is None:
+            self._parse()
+        return self._command
+
+    @property
+    def prefix(self):
+        """The message source, e.g. "nick!user@host", or None."""
+        if self._command is None:
+            self._parse()
+        if self._prefix is None:
+            return None
+        start, end = self._prefix
+        return self.line[start : end].decode("utf-8", "replace")
+
+    @property
+    def nick(self):
+        """The nick of the message source, or None."""
+        if self._command is None:
+            self._parse()
+        if self._prefix is None:
+            return None
+        start, end = self._prefix
+        bang = self.line.find(b"!", start, end)
+        return self.line[start : bang if bang >= 0 else end].decode(
+            "utf-8", "replace")
+
+    @property
+    def params(self):
+        """All parameters as strings, the trailing one last."""
+        if self._command is None:
+            self._parse()
+        line = self.line
+        params = []
+        pos = self._params_start
+        while pos < len(line):
+            if line.startswith(b":", pos):
+                params.append(line[pos + 1 :].decode("utf-8", "replace"))
+                break
+            end = line.find(b" ", pos)
+            if end < 0:
+                end = len(line)
+            params.append(line[pos : end].decode("utf-8", "replace"))
+            pos = end + 1
+        return params
+
+    @property
+    def trailing(self):
+        """The trailing parameter, e.g. the chat text of a PRIVMSG."""
+        if self._command is None:
+            self._parse()
+        colon = self.line.find(b" :", self._params_start - 1)
+        if colon < 0:
+            return None
+        return self.line[colon + 2 :].decode("utf-8", "replace")
+
+    def _raw_tags(self):
+        if self._tags is None:
+            if self._command is None:
+                self._parse()
+            self._tags = {}
+            if self._tags_end:
+                for item in self.line[1 : self._tags_end].split(b";"):
+                    key, _, value = item.partition(b"=")
+                    self._tags[key] = value
+        return self._tags
+
+    def tag(self, name, default=None):
+        """Return the decoded value of the IRCv3 tag `name`.
+
+        Parameters
+        ----------
+        name : str
+            Tag name, e.g. "display-name" or "tmi-sent-ts".
+        default : optional
+            Returned if the tag is missing.
+        """
+        if self._command is None:
+            self._parse()
+        # Find the one tag directly instead of splitting all of them
+        line = self.line
+        key = name.encode("ascii") + b"="
+        start = 1
+        while True:
+            start = line.find(key, start, self._tags_end)
+            if start < 0:
+                return default
+            if line[start - 1] in b"@;":
+                break
+            start += len(key)
+        start += len(key)
+        end = line.find(b";", start, self._tags_end)
+        if end < 0:
+            end = self._tags_end
+        return unescape_tag(line[start : end].decode("utf-8", "replace"))
+
+    @property
+    def tags(self):
+        """All tags decoded into a dict."""
+        return {key.decode("utf-8", "replace"):
+                    unescape_tag(value.decode("utf-8", "replace"))
+                for key, value in self._raw_tags().items()}
@@ -0,0 +1,95 @@
+"""
+.. module:: leaderboard
+   :synopsis: Rolling day/week/month leaderboards
+"""
+from collections import deque
+import heapq
+
+DAY = 86400
+# Leaderboard periods and their length in days
+PERIODS = {"day": 1, "week": 7, "month": 30}
+
+class PeriodLeaderboard:
+    """Points per user in daily buckets, with running totals for each
+    rolling period.
+
+    A point is added to the current bucket and to every period total.
+    When the day changes, the buckets which fall out of a period are
+    subtracted from its total, and buckets older than the longest
+    period are dropped, so memory is bounded by that period and
+    leaderboards never rescan the buckets.
+
+    Parameters
+    ----------
+    periods : dict of str to int
+        Period names and their length in days.
+    """
+    def __init__(self, periods=PERIODS):
+        self.periods = dict(periods)
+        self.retention = max(self.periods.values())
+        # [day, {user: points}], oldest first
+        self.buckets = deque()
+        self.totals = {name: {} for name in self.periods}
+        self.today = None
+
+    def advance(self, now):
+        today = int(now // DAY)
+        if self.today is not None and today <= self.today:
+            return
+        if self.today is None:
+            self.today = today
+            self.rebuild()
+            return
+        last = self.today
+        self.today = today
+        for name, span in self.periods.items():
+            totals = self.totals[name]
+            for day, counts in self.buckets:
+                # In the period before the change but not after it
+                if today - span < day or day <= last - span:
+                    continue
+                for user, points in counts.items():
+                    totals[user] -= points
+                    if totals[user] <= 0:
+                        del totals[user]
+        while self.buckets and self.buckets[0][0] <= today - self.retention:
+            self.buckets.popleft()
+
+    def rebuild(self):
+        """Recompute the period totals from the buckets."""
+        while (self.buckets
+               and self.buckets[0][0] <= self.today - self.retention):
+            self.buckets.popleft()
+        for name, span in self.periods.items():
+            totals = self.totals[name] = {}
+            for day, counts in self.buckets:
+                if day > self.today - span:
+                    for user, points in counts.items():
+                        totals[user] = totals.get(user, 0) + points
+
+    def add(self, username, now, points=1):
+        self.advance(now)
+        if not self.buckets or self.buckets[-1][0] != self.today:
+            self.buckets.append([self.today, {}])
+        counts = self.buckets[-1][1]
+        counts[username] = counts.get(username, 0) + points
+        for totals in self.totals.values():
+            totals[username] = totals.get(username, 0) + points
+
+    def top(self, period, n, now):
+        """Return the `n` users with the most points in `period` as
+        [[user, points], ...].
+        """
+        self.advance(now)
+        return [[user, points] for user, points in
+                heapq.nlargest(n, self.totals[period].items(),
+                               key=lambda x: x[1])]
+
+    def to_dict(self):
+        return {str(day): counts for day, counts in self.buckets}
+
+    def from_dict(self, data, now):
+        self.buckets = deque(sorted([int(day), counts]
+                                    for day, counts in data.items()))
+        self.today = int(now // DAY)
+        self.rebuild()
@@ -0,0 +1,76 @@
+"""
+.. module:: logsetup
+   :synopsis: Non-blocking logging with sampling of high-volume events
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+
+class SamplingFilter(logging.Filter):
+    """Passes at most `rate` records per second for each sample key.
+
+    Records opt in by passing ``extra={"sample": key}``, all others
+    pass. The first record let through after some were dropped notes how
+    many were dropped.
+
+    Parameters
+    ----------
+    rate : int
+        Records per second and key to let through, 0 to disable
+        sampling.
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        # key -> [window start, passed, dropped]
+        self.windows = {}
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or self.rate <= 0:
+            return True
+        window = self.windows.get(key)
+        if window is None or record.created - window[0] >= 1.0:
+            dropped = window[2] if window is not None else 0
+            window = self.windows[key] = [record.created, 0, 0]
+            if dropped:
+                record.msg = f"{record.msg} (%d more dropped)"
+                record.args = (*record.args, dropped)
+        if window[1] < self.rate:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+def setup_logging(fmt, level=logging.INFO, sample_rate=5):
+    """Send all logging through a queue to a background writer thread,
+    so logging calls never wait on terminal or file I/O.
+
+    Parameters
+    ----------
+    fmt : str
+        Log record format.
+    level : int
+        Root logger level.
+    sample_rate : int
+        Records per second let through for each sampled event.
+
+    Returns
+    -------
+    logging.handlers.QueueListener
+        The started listener, stopped at exit.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt))
+    # Unbounded, so putting a record never blocks
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,100 @@
+"""
+.. module:: memprofile
+   :synopsis: tracemalloc snapshots of the bot's heap
+"""
+import gc
+import logging
+import tracemalloc
+
+LOG = logging.getLogger("Memory")
+
+class MemoryProfiler:
+    """Takes tracemalloc snapshots and reports the largest allocation
+    sites and how they grew since the previous snapshot.
+
+    Tracing slows every allocation down, so it only starts with the
+    first snapshot (or right away if `interval` is set), and stops when
+    `interval` is set back to 0.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between periodic snapshots, 0 to only take them on
+        request.
+    limit : int
+        Number of allocation sites listed in a report.
+    frames : int
+        Stack frames stored per allocation.
+    """
+    def __init__(self, interval=0, limit=10, frames=1):
+        self.interval = interval
+        self.limit = limit
+        self.frames = frames
+        self.previous = None
+        self.next_snapshot = 0
+        # Whether tracing was started here rather than by the
+        # PYTHONTRACEMALLOC environment variable
+        self.started = False
+
+    def configure(self, interval, clock):
+        was_periodic = self.interval > 0
+        self.interval = interval
+        if interval > 0:
+            self.start()
+            self.next_snapshot = clock.time() + interval
+        elif was_periodic:
+            self.stop()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started = True
+            LOG.info("Memory tracing started.")
+
+    def stop(self):
+        self.previous = None
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+            LOG.info("Memory tracing stopped.")
+
+    def is_due(self, now):
+        return self.interval > 0 and now >= self.next_snapshot
+
+    def snapshot(self, now=None):
+        """Take a snapshot and log the top allocation sites and the
+        biggest changes since the previous one.
+
+        Returns
+        -------
+        str
+            One line summary of traced memory.
+        """
+        if now is not None:
+            self.next_snapshot = now + self.interval
+        if not tracemalloc.is_tracing():
+            self.start()
+            return "Memory tracing started, take another snapshot later."
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        LOG.info("Top %d allocation sites:", self.limit)
+        for stat in snapshot.statistics("lineno")[: self.limit]:
+            LOG.info("  %s", stat)
+        if self.previous is not None:
+            LOG.info("Top %d changes since last snapshot:", self.limit)
+            for stat in snapshot.compare_to(self.previous,
+                                            "lineno")[: self.limit]:
+                LOG.info("  %s", stat)
+        self.previous = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return (f"Traced memory: {current / 2 ** 20:.1f} MiB "
+                f"(peak {peak / 2 ** 20:.1f} MiB), "
+                f"{len(gc.get_objects())} GC tracked objects.")
+
+def freeze_heap():
+    """Move every object alive now into the permanent generation, so
+    the cyclic GC no longer scans the long-lived questions and scores.
+    """
+    gc.collect()
+    gc.freeze()
+    LOG.info("Heap frozen: %d objects.", gc.get_freeze_count())
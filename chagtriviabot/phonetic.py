@@ -0,0 +1,131 @@
+"""
+.. module:: phonetic
+   :synopsis: Phonetic keys for sound-alike answer matching
+"""
+import re
+
+VOWELS = "aeiou"
+FRONT_VOWELS = "eiy"
+_NON_LETTERS = re.compile(r"[^a-z]")
+_SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(
+    ["aeiouy", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+                  for letter in letters}
+
+def soundex(word):
+    """Return the American Soundex code of `word`, e.g. "R163" for
+    "robert", or "" if it has no letters.
+    """
+    word = _NON_LETTERS.sub("", word.lower())
+    if not word:
+        return ""
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0])
+    for char in word[1 :]:
+        digit = _SOUNDEX_CODES.get(char)
+        if digit is None:
+            # h and w do not separate letters with the same code
+            continue
+        if digit != last and digit != "0":
+            code += digit
+        last = digit
+    return (code + "000")[: 4]
+
+def metaphone(word):
+    """Return a Metaphone key of `word`, a compact form of the original
+    Metaphone rules: consonants are reduced to one code per sound,
+    silent letters are dropped and only a leading vowel is kept (as
+    "A"), e.g. "XKFSK" for both "tchaikovsky" and "chaikovsky".
+    """
+    word = _NON_LETTERS.sub("", word.lower())
+    if word[: 2] in ("kn", "gn", "pn", "ae", "wr"):
+        word = word[1 :]
+    elif word.startswith("x"):
+        word = "s" + word[1 :]
+    elif word.startswith("wh"):
+        word = "w" + word[2 :]
+    key = []
+    length = len(word)
+    for i, char in enumerate(word):
+        prev = word[i - 1] if i > 0 else ""
+        after = word[i + 1 : i + 3]
+        nxt = after[: 1]
+        if char == prev and char != "c":
+            continue
+        code = ""
+        if char in VOWELS:
+            code = "A" if i == 0 else ""
+        elif char == "b":
+            code = "" if prev == "m" and i == length - 1 else "P"
+        elif char == "c":
+            if after == "ia" or nxt == "h":
+                code = "K" if prev == "s" else "X"
+            elif nxt and nxt in FRONT_VOWELS:
+                code = "" if prev == "s" else "S"
+            else:
+                code = "K"
+        elif char == "d":
+            dge = nxt == "g" and after[1 :] and after[1 :] in FRONT_VOWELS
+            code = "J" if dge else "T"
+        elif char == "g":
+            if nxt == "h" and i + 2 < length and word[i + 2] not in VOWELS:
+                code = ""
+            elif nxt == "n" and (i + 2 == length or word[i + 2 :] == "ed"):
+                code = ""
+            elif prev == "d" and nxt and nxt in FRONT_VOWELS:
+                code = ""
+            elif nxt and nxt in FRONT_VOWELS:
+                code = "J"
+            else:
+                code = "K"
+        elif char == "h":
+            if not (prev and prev in "csptg") and nxt and nxt in VOWELS:
+                code = "H"
+        elif char == "k":
+            code = "" if prev == "c" else "K"
+        elif char == "p":
+            code = "F" if nxt == "h" else "P"
+        elif char == "q":
+            code = "K"
+        elif char == "s":
+            code = "X" if nxt == "h" or after in ("io", "ia") else "S"
+        elif char == "t":
+            if after in ("io", "ia"):
+                code = "X"
+            elif nxt == "h":
+                code = "0"
+            elif after != "ch":
+                code = "T"
+        elif char == "v":
+            code = "F"
+        elif char in "wy":
+            if nxt and nxt in VOWELS:
+                code = char.upper()
+        elif char == "x":
+            code = "KS"
+        elif char == "z":
+            code = "S"
+        else:
+            code = char.upper()
+        if code and not (key and key[-1] == code):
+            key.append(code)
+    return "".join(key)
+
+ENCODERS = {"metaphone": metaphone, "soundex": soundex}
+
+def phonetic_key(normalized, encoder=metaphone):
+    """Encode every word of a normalized answer or guess.
+
+    Parameters
+    ----------
+    normalized : str
+        Text as returned by :func:`normalize_answer`.
+    encoder : function
+        Word encoder, :func:`metaphone` or :func:`soundex`.
+
+    Returns
+    -------
+    str
+        The word keys separated by spaces.
+    """
+    return " ".join(code for code in map(encoder, normalized.split())
+                    if code)
@@ -0,0 +1,94 @@
+"""
+.. module:: prefilter
+   :synopsis: Cheap lower bounds on answer closeness
+"""
+from functools import lru_cache
+
+from chagtriviabot.helpers import align_tokens, gap_costs
+
+# Characters and bigrams are hashed to bits of these many
+MASK_BITS = 127
+
+@lru_cache(maxsize=4096)
+def signature(token):
+    """Return the length, character bitmask and bigram bitmask of
+    `token`. Tokens repeat across guesses and questions, so these are
+    cached for the whole process.
+    """
+    chars = 0
+    for char in token:
+        chars |= 1 << (ord(char) % MASK_BITS)
+    grams = 0
+    for i in range(len(token) - 1):
+        grams |= 1 << ((ord(token[i]) * 31 + ord(token[i + 1]))
+                       % MASK_BITS)
+    return len(token), chars, grams
+
+def pair_bound(sig_a, sig_m):
+    """Lower bound of the normalized distance of two tokens from their
+    signatures.
+    """
+    len_a, chars_a, grams_a = sig_a
+    len_m, chars_m, grams_m = sig_m
+    longest = max(len_a, len_m)
+    if longest == 0:
+        return 0.0
+    # Ceiling divisions of the set differences
+    dist = max(abs(len_a - len_m),
+               -(-(chars_a ^ chars_m).bit_count() // 2),
+               -(-(grams_a & ~grams_m).bit_count() // 3),
+               -(-(grams_m & ~grams_a).bit_count() // 3))
+    return dist / longest
+
+class AnswerPrefilter:
+    """Lower bound of :meth:`TriviaSession.closeness` for a guess,
+    computed from the lengths and the character and bigram sets of each
+    answer token.
+
+    For every pair of tokens of lengths `len_a` and `len_m` the
+    Damerau-Levenshtein OSA distance `d` satisfies
+
+    * ``d >= |len_a - len_m|``,
+    * ``d >= |chars_a ^ chars_m| / 2``, since a single edit adds at most
+      one character to the set and removes at most one, and
+    * ``d >= |grams_a - grams_m| / 3`` (and the same the other way
+      round), since a single edit, including a transposition, destroys
+      at most three bigrams.
+
+    The sets are kept as bitmasks of hashed characters and bigrams.
+    Collisions can only shrink the differences, so the bounds hold.
+
+    Aligning the tokens with these per-pair bounds in place of the
+    distances gives a cost which is never larger than the real
+    closeness, and a guess whose bound already reaches the tolerance can
+    be rejected without running the edit distance.
+
+    Parameters
+    ----------
+    answer : str
+        The answer of the current question.
+    """
+    def __init__(self, answer):
+        parts = answer.lower().split(" ")
+        self.tokens = [signature(token) for token in parts]
+        self.gaps = gap_costs(parts)
+
+    def lower_bound(self, guess):
+        """Compute the closeness lower bound of a lowercased `guess`.
+
+        Returns
+        -------
+        float
+            A value no larger than the closeness of `guess`.
+        """
+        parts = guess.split(" ")
+        sigs = [signature(token) for token in parts]
+        gaps = gap_costs(parts)
+        total = align_tokens(
+            self.gaps, gaps,
+            lambda i, j: pair_bound(self.tokens[i], sigs[j]))
+        return total / max(sum(self.gaps), sum(gaps))
+
+    def rejects(self, guess, tol):
+        """Return True if `guess` certainly cannot be within `tol`."""
+        return self.lower_bound(guess) >= tol
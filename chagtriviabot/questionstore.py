@@ -0,0 +1,165 @@
+import logging
+import random
+
+import pandas as pd
+
+from chagtriviabot.aliases import expand_answer
+from chagtriviabot.dedup import DuplicateIndex
+from chagtriviabot.helpers import TextNormalizer
+from chagtriviabot.phonetic import metaphone, phonetic_key
+
+LOG = logging.getLogger("Store")
+
+class QuestionStore:
+    """Column-oriented store of cleaned trivia questions. Text is
+    cleaned once when it is added, so lookups during a game are plain
+    list indexing.
+
+    Parameters
+    ----------
+    normalizer : TextNormalizer, optional
+        Cleans the text of added questions.
+    encoder : function, optional
+        Word encoder used for the phonetic keys of answers.
+    """
+    def __init__(self, normalizer=None, encoder=metaphone):
+        if normalizer is None:
+            normalizer = TextNormalizer()
+        self.normalizer = normalizer
+        self.encoder = encoder
+        self.categories = []
+        self.questions = []
+        self.answers = []
+        # Normalized alternate forms accepted for each answer
+        self.aliases = []
+        # Phonetic keys of the accepted forms of each answer
+        self.phonetic_keys = []
+        # Questions with lower ids come from the loaded file, the rest
+        # were added at runtime (remote clues) and get new ids on restart
+        self.num_local = 0
+        # Rejects questions already in the store in the same or
+        # different wording
+        self.duplicates = DuplicateIndex()
+        # Lowercased category -> question ids, and the shuffled order
+        # and position each category is being drawn from
+        self.by_category = {}
+        self.cursors = {}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def load(self, filename, filetype):
+        # open trivia source based on type
+        if filetype == "csv":
+            frame = pd.read_csv(f"{filename}.{filetype}", dtype=str,
+                                keep_default_na=False)
+        elif filetype in ("xlsx", "xls"):
+            frame = pd.read_excel(f"{filename}.{filetype}", dtype=str)
+        else:
+            LOG.error("Invalid filetype.")
+            raise ValueError
+        # Category, Question and Answer are the first three columns
+        ids = self.add_many(frame.iloc[:, 0].tolist(),
+                            frame.iloc[:, 1].tolist(),
+                            frame.iloc[:, 2].tolist())
+        self.num_local = len(self.questions)
+        LOG.info("Loaded %d of %d rows from %s.%s", len(ids), len(frame),
+                 filename, filetype)
+        LOG.info("Dropped %d exact and %d near duplicate questions.",
+                 self.duplicates.exact, self.duplicates.near)
+
+    def add_many(self, categories, questions, answers):
+        """Clean and add a batch of questions, skipping any with an
+        empty field after cleaning or which duplicate a stored question.
+
+        Returns
+        -------
+        list of int
+            The ids of the questions which were added.
+        """
+        rows = zip(self.normalizer.normalize_all(categories),
+                   self.normalizer.normalize_all(questions),
+                   self.normalizer.normalize_all(answers))
+        ids = []
+        for category, question, answer in rows:
+            if not (category and question and answer):
+                continue
+            if not self.duplicates.add(question, answer):
+                continue
+            ids.append(len(self.questions))
+            self.categories.append(category)
+            self.questions.append(question)
+            self.answers.append(answer)
+            aliases = expand_answer(answer)
+            self.aliases.append(aliases)
+            keys = {}
+            for alias in aliases:
+                keys.setdefault(phonetic_key(alias, self.encoder),
+                                []).append(alias)
+            self.phonetic_keys.append(keys)
+            self.by_category.setdefault(category.lower(), []).append(ids[-1])
+        return ids
+
+    def has_category(self, category):
+        return category.lower() in self.by_category
+
+    def category_size(self, category):
+        return len(self.by_category.get(category.lower(), ()))
+
+    def draw(self, category, k):
+        """Draw up to `k` distinct questions from `category`. Each
+        category is walked in a shuffled order which is only reshuffled
+        once it has been used up, so questions do not repeat across
+        sessions until the whole category has been asked.
+
+        Parameters
+        ----------
+        category : str
+            Category name, case insensitive.
+        k : int
+            Number of questions wanted.
+
+        Returns
+        -------
+        list of int
+            The ids of the drawn questions.
+        """
+        key = category.lower()
+        ids = self.by_category.get(key, [])
+        k = min(k, len(ids))
+        order, pos = self.cursors.get(key, ([], 0))
+        drawn = []
+        seen = set()
+        while len(drawn) < k:
+            if pos >= len(order):
+                order = ids[:]
+                random.shuffle(order)
+                pos = 0
+            qid = order[pos]
+            pos += 1
+            if qid not in seen:
+                seen.add(qid)
+                drawn.append(qid)
+        self.cursors[key] = (order, pos)
+        return drawn
+
+    def category(self, qid):
+        return self.categories[qid]
+
+    def question(self, qid):
+        return self.questions[qid]
+
+    def answer(self, qid):
+        return self.answers[qid]
+
+    def is_alias(self, qid, normalized_guess):
+        return normalized_guess in self.aliases[qid]
+
+    def phonetic_key(self, normalized_guess):
+        return phonetic_key(normalized_guess, self.encoder)
+
+    def sound_alikes(self, qid, guess_key):
+        """Return the accepted forms of answer `qid` whose phonetic key
+        is `guess_key`.
+        """
+        return self.phonetic_keys[qid].get(guess_key, ())
@@ -0,0 +1,78 @@
+"""
+.. module:: sampler
+   :synopsis: Sampling profiler for the bot's main loop
+"""
+from collections import Counter
+import logging
+import os
+import sys
+import threading
+import time
+
+LOG = logging.getLogger("Sampler")
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread and
+    writes the counts in collapsed stack format (one
+    ``frame;frame;frame count`` line per distinct stack), as read by
+    flamegraph.pl and speedscope.
+
+    Nothing runs while no profile is being taken.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between samples.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, thread_id, duration, path):
+        """Sample thread `thread_id` for `duration` seconds, then write
+        the stacks to `path`. Returns False if a profile is already
+        being taken.
+        """
+        if self.is_running():
+            return False
+        self.thread = threading.Thread(
+            target=self.run, args=(thread_id, duration, path), daemon=True)
+        self.thread.start()
+        return True
+
+    @staticmethod
+    def collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} "
+                         f"({os.path.basename(code.co_filename)}:"
+                         f"{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def run(self, thread_id, duration, path):
+        stacks = Counter()
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stacks[self.collapse(frame)] += 1
+            del frame
+            time.sleep(self.interval)
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w") as out:
+                for stack, count in stacks.most_common():
+                    out.write(f"{stack} {count}\n")
+        except OSError as e:
+            LOG.error("Profile NOT saved! Reason: %s", e)
+            return
+        LOG.info("Profile of %d samples written to %s",
+                 sum(stacks.values()), path)
@@ -0,0 +1,151 @@
+"""
+.. module:: scorefeed
+   :synopsis: Live score feed for stream overlays
+
+Overlays connect to ``http://<host>:<port>/events`` and receive
+server-sent events:
+
+* ``snapshot``: ``{"fields": ["session", "overall", "match"],
+  "users": [[user, session, overall, match], ...]}`` in rank order,
+  once on connect and again whenever the score file is reloaded.
+* ``delta``: ``[user, field, value, rank, rank_change]`` for every
+  score change, where rank is the 1-based position on the overall
+  leaderboard (match wins, then points) and a positive rank_change is
+  a move up.
+"""
+import bisect
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import queue
+import threading
+
+from chagtriviabot.scoretracker import FIELDS
+
+LOG = logging.getLogger("ScoreFeed")
+
+class ScoreFeed:
+    """Mirrors the scores of a :class:`ScoreTracker` it is subscribed to
+    and fans the changes out to connected clients. Clients each have a
+    bounded queue; one which falls behind is disconnected rather than
+    holding up the bot.
+
+    Parameters
+    ----------
+    max_queue : int
+        Messages buffered per client.
+    """
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.scores = {}
+        # (-match, -overall, user) sorted, i.e. in rank order
+        self.ranking = []
+
+    @staticmethod
+    def rank_key(username, score):
+        return (-score[2], -score[1], username)
+
+    def scores_loaded(self, data):
+        with self.lock:
+            self.scores = {user: list(score) for user, score in data.items()}
+            self.ranking = sorted(self.rank_key(user, score)
+                                  for user, score in self.scores.items())
+            message = self.encode("snapshot", self.snapshot())
+            self.broadcast(message)
+
+    def score_changed(self, username, field, value):
+        with self.lock:
+            score = self.scores.get(username)
+            if score is None:
+                score = self.scores[username] = [0, 0, 0]
+                old_rank = None
+            else:
+                key = self.rank_key(username, score)
+                old_rank = bisect.bisect_left(self.ranking, key)
+                del self.ranking[old_rank]
+            score[FIELDS.index(field)] = value
+            rank = bisect.bisect_left(self.ranking,
+                                      self.rank_key(username, score))
+            self.ranking.insert(rank, self.rank_key(username, score))
+            change = 0 if old_rank is None else old_rank - rank
+            self.broadcast(self.encode(
+                "delta", [username, field, value, rank + 1, change]))
+
+    def snapshot(self):
+        return {"fields": list(FIELDS),
+                "users": [[user, *self.scores[user]]
+                          for _, _, user in self.ranking]}
+
+    @staticmethod
+    def encode(event, data):
+        return (f"event: {event}\ndata: "
+                f"{json.dumps(data, separators=(',', ':'))}\n\n"
+                ).encode("utf-8")
+
+    def broadcast(self, message):
+        for client in list(self.clients):
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                LOG.warning("Dropping a feed client which fell behind.")
+                # Its handler stops once it sees it is no longer listed
+                self.clients.discard(client)
+
+    def connect(self):
+        """Register a client queue, starting with a snapshot."""
+        client = queue.Queue(self.max_queue)
+        with self.lock:
+            client.put_nowait(self.encode("snapshot", self.snapshot()))
+            self.clients.add(client)
+        return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    # Comment line sent when idle so dead connections are noticed
+    KEEPALIVE = 15
+
+    def do_GET(self):
+        if self.path != "/events":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        feed = self.server.feed
+        client = feed.connect()
+        try:
+            while True:
+                try:
+                    message = client.get(timeout=self.KEEPALIVE)
+                except queue.Empty:
+                    message = b": keepalive\n\n"
+                if client not in feed.clients:
+                    break
+                self.wfile.write(message)
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            feed.disconnect(client)
+
+    def log_message(self, format, *args):
+        LOG.debug(format, *args)
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host, port, feed):
+        super().__init__((host, port), FeedRequestHandler)
+        self.feed = feed
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        LOG.info("Score feed on http://%s:%d/events", *self.server_address)
@@ -0,0 +1,222 @@
+"""
+.. module:: scoreservice
+   :synopsis: Score aggregation shared by several bot instances
+
+Usage: python -m chagtriviabot.scoreservice <socket path> [score file]
+
+The service owns the overall points and match wins of every user. Bots
+connect over a UNIX socket and talk newline-delimited JSON:
+
+* ``{"op": "add", "deltas": {user: [points, wins]}}`` adds to the
+  totals. There is no reply.
+* ``{"op": "top", "n": n}`` replies ``{"top": [[user, wins, points]]}``.
+* ``{"op": "stats", "user": user}`` replies ``{"stats": [points, wins]}``
+  or ``{"stats": null}``.
+
+Running the module starts a stand-in service for local use and tests.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+LOG = logging.getLogger("ScoreService")
+
+class ScoreRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = self.server.handle_request(request)
+            except (KeyError, TypeError, ValueError) as e:
+                LOG.warning("Bad request: %s", e)
+                reply = {"error": str(e)}
+            if reply is not None:
+                self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+class ScoreServer(socketserver.ThreadingUnixStreamServer):
+    """Keeps the totals in memory and writes them to `score_path` at
+    most every `flush_interval` seconds, so many deltas cost one write.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, score_path, flush_interval=5.0):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, ScoreRequestHandler)
+        self.score_path = score_path
+        self.flush_interval = flush_interval
+        self.data = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.stopped = threading.Event()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.score_path):
+            return
+        try:
+            with open(self.score_path, "r") as scores:
+                self.data = json.load(scores)
+        except (OSError, ValueError) as e:
+            LOG.error("Scores NOT loaded! Reason: %s", e)
+        LOG.info("Loaded %d users.", len(self.data))
+
+    def dump(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.data)
+            self.dirty = False
+        tmp_path = f"{self.score_path}.tmp"
+        try:
+            with open(tmp_path, "w") as scores:
+                scores.write(snapshot)
+            os.replace(tmp_path, self.score_path)
+        except OSError as e:
+            LOG.error("Scores NOT saved! Reason: %s", e)
+            with self.lock:
+                self.dirty = True
+
+    def flush_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.dump()
+        self.dump()
+
+    def handle_request(self, request):
+        op = request["op"]
+        with self.lock:
+            if op == "add":
+                for user, (points, wins) in request["deltas"].items():
+                    # Same layout as the bot's score file, with the
+                    # session points left at 0
+                    score = self.data.setdefault(user, [0, 0, 0])
+                    score[1] += points
+                    score[2] += wins
+                self.dirty = True
+                return None
+            if op == "top":
+                users = sorted(self.data,
+                               key=lambda x: (self.data[x][2],
+                                              self.data[x][1]),
+                               reverse=True)[: int(request["n"])]
+                return {"top": [[user, self.data[user][2],
+                                 self.data[user][1]] for user in users]}
+            if op == "stats":
+                score = self.data.get(request["user"])
+                return {"stats": score[1 :] if score else None}
+        raise ValueError(f"unknown op {op!r}")
+
+    def serve(self):
+        flusher = threading.Thread(target=self.flush_loop, daemon=True)
+        flusher.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.stopped.set()
+            flusher.join()
+            self.server_close()
+            os.remove(self.server_address)
+
+class ScoreClient:
+    """Bot side of the service.
+
+    Deltas are summed per user and sent by a background thread every
+    `interval` seconds, so awarding a point never waits on the socket.
+    Deltas which fail to send are kept for the next attempt. Queries
+    are synchronous and return None if the service is unreachable.
+    """
+    def __init__(self, socket_path, interval=1.0, timeout=2.0):
+        self.socket_path = socket_path
+        self.interval = interval
+        self.timeout = timeout
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sock = None
+        self.sender = threading.Thread(target=self.send_loop, daemon=True)
+        self.sender.start()
+
+    def add(self, username, points=0, wins=0):
+        with self.lock:
+            delta = self.pending.setdefault(username, [0, 0])
+            delta[0] += points
+            delta[1] += wins
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def flush(self):
+        with self.lock:
+            deltas, self.pending = self.pending, {}
+        if not deltas:
+            return
+        try:
+            if self.sock is None:
+                self.sock = self.connect()
+            self.sock.sendall(json.dumps({"op": "add", "deltas": deltas})
+                              .encode("utf-8") + b"\n")
+        except OSError as e:
+            LOG.warning("Score deltas NOT sent! Reason: %s", e)
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            with self.lock:
+                for user, (points, wins) in deltas.items():
+                    delta = self.pending.setdefault(user, [0, 0])
+                    delta[0] += points
+                    delta[1] += wins
+
+    def send_loop(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        self.sender.join()
+        self.flush()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def query(self, request):
+        try:
+            with self.connect() as sock:
+                sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as reply:
+                    return json.loads(reply.readline())
+        except (OSError, ValueError) as e:
+            LOG.warning("Score service query failed: %s", e)
+            return None
+
+    def top(self, n):
+        """Return [[user, wins, points], ...] like
+        :meth:`ScoreTracker.get_overall_top`, or None.
+        """
+        reply = self.query({"op": "top", "n": n})
+        return None if reply is None else reply.get("top")
+
+    def stats(self, username):
+        """Return [points, wins] of `username`, or None."""
+        reply = self.query({"op": "stats", "user": username})
+        return None if reply is None else reply.get("stats")
+
+def main(socket_path, score_path="servicescores.txt"):
+    logging.basicConfig(
+        format="%(asctime)-15s %(levelname)7s %(name)7s: %(message)s",
+        level=logging.INFO)
+    server = ScoreServer(socket_path, score_path)
+    LOG.info("Serving scores on %s", socket_path)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(*sys.argv[1 :])
@@ -3,17 +3,47 @@ import json
 import logging
 import os.path
 
+from chagtriviabot.leaderboard import PeriodLeaderboard
+
 LOG = logging.getLogger("Score")
 
+# Score fields, in the order they are stored per user
+FIELDS = ("session", "overall", "match")
+
 class ScoreTracker:
     def __init__(self):
         self.data = None
         self.is_loaded = False
+        # Bumped on every change to `data` so rendered score messages
+        # can be cached until the scores change
+        self.version = 0
+        # Points per day for the day/week/month leaderboards
+        self.periods = PeriodLeaderboard()
+        # Notified of score changes, see subscribe()
+        self.listeners = []
 
     def is_ready(self):
         return self.is_loaded
 
+    def touch(self):
+        self.version += 1
+
+    def subscribe(self, listener):
+        """Notify `listener` of every change: score_changed(username,
+        field, value) for a single score and scores_loaded(data) when
+        all of them are replaced.
+        """
+        self.listeners.append(listener)
+        if self.data is not None:
+            listener.scores_loaded(self.data)
+
+    def changed(self, username, field):
+        value = self.data[username][FIELDS.index(field)]
+        for listener in self.listeners:
+            listener.score_changed(username, field, value)
+
     def load(self, score_path):
+        self.touch()
         if os.path.exists(score_path):
             with open(score_path, "r") as scores:
                 self.data = json.load(scores)
@@ -24,6 +54,8 @@ class ScoreTracker:
             self.is_loaded = True
             self.dump(score_path)
             LOG.warning("No score list found, creating...")
+        for listener in self.listeners:
+            listener.scores_loaded(self.data)
 
     def dump(self, score_path):
         try:
@@ -33,20 +65,60 @@ class ScoreTracker:
             LOG.error("Scores NOT saved! Reason: %s", e)
             self.is_loaded = False
 
+    def load_periods(self, period_path, now):
+        if not os.path.exists(period_path):
+            self.periods.from_dict({}, now)
+            return
+        try:
+            with open(period_path, "r") as periods:
+                self.periods.from_dict(json.load(periods), now)
+        except (OSError, ValueError) as e:
+            LOG.error("Period scores NOT loaded! Reason: %s", e)
+            self.periods.from_dict({}, now)
+
+    def dump_periods(self, period_path):
+        try:
+            with open(period_path, "w") as periods:
+                json.dump(self.periods.to_dict(), periods)
+        except (OSError, TypeError, ValueError) as e:
+            LOG.error("Period scores NOT saved! Reason: %s", e)
+
+    def period_add(self, username, now):
+        self.periods.add(username, now)
+        self.touch()
+
+    def get_period_top(self, period, n, now):
+        return self.periods.top(period, n, now)
+
     def clear(self):
         for i in self.data:
-            self.data[i][0] = 0
+            if self.data[i][0]:
+                self.data[i][0] = 0
+                self.changed(i, "session")
+        self.touch()
+
+    def set_session(self, username, score):
+        self.data[username][0] = score
+        self.touch()
+        self.changed(username, "session")
 
     def user_add(self, score_type, username):
+        self.touch()
         if score_type == "session":
             self.data[username][0] += 1
         elif score_type == "overall":
             self.data[username][1] += 1
         elif score_type == "match":
             self.data[username][2] += 1
+        else:
+            return
+        self.changed(username, score_type)
 
     def create_user(self, username):
         self.data[username] = [1, 1, 0]
+        self.touch()
+        self.changed(username, "session")
+        self.changed(username, "overall")
 
     def assign_winner(self, username):
         self.user_add("match", username)
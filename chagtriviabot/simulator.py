@@ -0,0 +1,147 @@
+"""
+.. module:: simulator
+   :synopsis: Headless game simulator running on virtual time
+
+Usage: python -m chagtriviabot.simulator [sessions] [viewers] [seed]
+
+Plays whole trivia sessions against a scripted chat population using a
+:class:`SimulatedClock`, so hours of gameplay take seconds, and reports
+the CPU time spent in each phase of the game loop.
+"""
+from collections import defaultdict
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from chagtriviabot.bot import ChagTriviaBot
+from chagtriviabot.clock import SimulatedClock
+
+# Bot methods timed as phases. Time is exclusive, i.e. a phase does not
+# include the phases it calls
+PHASES = ["start_session", "ask_question", "ask_hint", "answer_question",
+          "skip_question", "end_session", "process_message",
+          "routine_check"]
+
+class ScriptedChat:
+    """Stands in for :class:`Chat`: records what the bot sends instead
+    of writing to a socket.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self.sent = 0
+
+    def is_ready(self):
+        return True
+
+    def send_msg(self, msg):
+        self.sent += 1
+
+class Viewer:
+    """A scripted chatter. Each second the viewer posts with probability
+    `activity`, and knows the answer with probability `skill`, which
+    grows as hints are given.
+    """
+    CHATTER = ["lol", "KEKW", "no idea", "what", "pog", "this one is hard",
+               "first", "gg", "LUL", "who knows"]
+
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.activity = rng.uniform(0.02, 0.3)
+        self.skill = rng.uniform(0.0, 0.004)
+
+    def message(self, session):
+        roll = self.rng.random()
+        if roll < self.skill * (1 + 2 * session.hint_req):
+            answer = session.answer()
+            if self.rng.random() < 0.3 and len(answer) > 3:
+                i = self.rng.randrange(len(answer))
+                answer = answer[: i] + answer[i + 1 :]
+            return answer
+        if roll < 0.5:
+            return self.rng.choice(session.store.answers)
+        return self.rng.choice(self.CHATTER)
+
+class PhaseTimer:
+    """Accumulates exclusive CPU time per phase by wrapping methods."""
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._stack = []
+
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            self._stack.append(0.0)
+            start = time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.process_time() - start
+                children = self._stack.pop()
+                self.totals[name] += elapsed - children
+                self.calls[name] += 1
+                if self._stack:
+                    self._stack[-1] += elapsed
+        return timed
+
+    def instrument(self, obj, names):
+        for name in names:
+            setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+def simulate(num_sessions=100, num_viewers=200, seed=0):
+    """Play `num_sessions` sessions and return the :class:`PhaseTimer`
+    and the simulated bot.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    clock = SimulatedClock()
+    bot = ChagTriviaBot(clock)
+    bot.load_config()
+    bot.scores.data = {}
+    bot.scores.is_loaded = True
+    bot.chat = ScriptedChat(bot)
+    bot.session.use_remote = False
+    viewers = [Viewer(f"viewer{i}", rng) for i in range(num_viewers)]
+    admin = bot.var.ADMINS[0]
+
+    timer = PhaseTimer()
+    timer.instrument(bot, PHASES)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # scores and checkpoints are written relative to the cwd
+        os.chdir(tmp_dir)
+        try:
+            for _ in range(num_sessions):
+                bot.process_message(admin, f"{bot.var.PREFIX}triviastart")
+                while bot.is_active:
+                    bot.routine_check()
+                    for viewer in viewers:
+                        if (bot.is_active and bot.question_asked
+                                and rng.random() < viewer.activity):
+                            bot.process_message(
+                                viewer.name, viewer.message(bot.session))
+                    clock.sleep(1)
+        finally:
+            os.chdir(cwd)
+    return timer, bot
+
+def main(num_sessions=100, num_viewers=200, seed=0):
+    logging.disable(logging.WARNING)
+    start = time.process_time()
+    timer, bot = simulate(num_sessions, num_viewers, seed)
+    total = time.process_time() - start
+    print(f"{num_sessions} sessions, {num_viewers} viewers, "
+          f"{bot.clock.time() / 3600:.1f} virtual hours in {total:.2f}s CPU "
+          f"({sum(timer.totals.values()):.2f}s in game phases)")
+    print(f"{'phase':<16}{'calls':>10}{'CPU s':>10}{'us/call':>10}")
+    for name in PHASES:
+        calls = timer.calls[name]
+        cpu = timer.totals[name]
+        per_call = 1e6 * cpu / calls if calls else 0.0
+        print(f"{name:<16}{calls:>10}{cpu:>10.3f}{per_call:>10.1f}")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1 :]))
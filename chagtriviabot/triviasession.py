@@ -1,33 +1,102 @@
+from collections import namedtuple
 import json
 import logging
+import math
 import random
-from statistics import mean
+import time
 
-import pandas as pd
 import requests
 
+from chagtriviabot.aliases import normalize_answer
+from chagtriviabot.clock import Clock
 from chagtriviabot.editdistance import DistanceAlgorithm, EditDistance
-from chagtriviabot.helpers import replace_multiple_substring
+from chagtriviabot.helpers import LRUCache, align_tokens, gap_costs
+from chagtriviabot.prefilter import AnswerPrefilter
 
 LOG = logging.getLogger("Session")
 
+# The slow part of building a quizset: remote clues and a sample of
+# local question ids, drawn from `store`
+Quizset = namedtuple("Quizset", ["store", "num_qs", "clues", "sample",
+                                 "build_time"])
+
 class TriviaSession:
-    def __init__(self):
-        self.data = None
+    # Tolerance before any hint. Hints only lower it
+    TOLERANCE = 0.4
+    # Answer matchers by name, in the order of cost
+    MATCHERS = {"exact": "match_exact", "normalized": "match_normalized",
+                "phonetic": "match_phonetic", "edit": "fuzzy_match"}
+    # Shorter phonetic keys are too likely to collide, e.g. "KT" for
+    # both "cat" and "kit"
+    MIN_PHONETIC_KEY = 4
+    # A sound-alike guess must also be this close to the matching form.
+    # Unlike TOLERANCE it is not lowered by hints, which is what the
+    # phonetic stage adds over the edit distance
+    PHONETIC_TOLERANCE = 0.35
+
+    def __init__(self, clock=None):
+        self.clock = Clock() if clock is None else clock
+        # Fetch extra questions from jservice when building a quizset
+        self.use_remote = True
+        # Names of the matchers tried on a guess, in order
+        self.matchers = list(self.MATCHERS)
+        self.store = None
+        # Question ids (into `store`) making up the quizset
+        self.data = []
         self.comparer = None
+        # (closeness, stage) of each distinct (lowercased) guess at the
+        # current question, where stage is "edit", or "prefilter" if the
+        # closeness is the bound it was rejected with. The tolerance is
+        # applied afterwards, and only goes down within a question, so
+        # entries stay valid when a hint lowers it
+        self.guess_cache = LRUCache(1024)
+        # Normalized distance of each (answer token, guess token) pair
+        # seen at the current question
+        self.token_distances = LRUCache(4096)
+        # Closeness of each distinct guess to the sound-alike form it
+        # matched at the current question, 1.0 if it matched none
+        self.phonetic_matches = LRUCache(1024)
+        # Compute token distances in full rather than only up to where
+        # they rule a pair out, so the closeness of far guesses is real
+        # rather than saturated at 1 (for analytics, at some CPU cost)
+        self.uncapped = False
+        # Rejects guesses which cannot be close enough to the current
+        # answer before the edit distance is computed
+        self.prefilter = None
+        self.filtered = 0
+        # Closeness of the last checked guess and the stage which
+        # decided it: the matcher which accepted it, otherwise the last
+        # matcher tried or "prefilter". Closeness is only a lower bound
+        # for "prefilter" and is 1.0 if no matcher measured it
+        self.last_closeness = 0.0
+        self.last_stage = ""
         self.q_no = 0
         # 0 = not requested, 1 = first hint requested, 2 = second hint
         # requested
         self.hint_req = 0
+        # Order in which the answer's characters are revealed by hints,
+        # and how many of them each hint stage reveals
+        self.hint_order = []
+        self.hint_counts = []
         # Time when the last question was asked (used for relative time
         # length for hints/skip)
         self.ask_time = 0
 
-    def reset(self, columns):
-        self.data = pd.DataFrame(columns=columns)
-        self.comparer = EditDistance(DistanceAlgorithm.DAMERUAUOSA)
+    def reset(self, store):
+        self.store = store
+        self.data = []
+        # Thread safe so guesses can be scored from worker threads
+        self.comparer = EditDistance(DistanceAlgorithm.DAMERUAUOSA,
+                                     is_thread_safe=True)
+        self.guess_cache.clear()
+        self.token_distances.clear()
+        self.phonetic_matches.clear()
+        self.prefilter = None
+        self.filtered = 0
         self.q_no = 0
         self.hint_req = 0
+        self.hint_order = []
+        self.hint_counts = []
         self.ask_time = 0
 
     # def fuzzy_match(self, message):
@@ -39,89 +108,308 @@ class TriviaSession:
     #              closeness, tol)
     #     return closeness < tol
 
+    def tolerance(self):
+        return max(0.1, self.TOLERANCE - 0.15 * self.hint_req)
+
     def fuzzy_match(self, message):
-        def max_len(string_1, string_2):
-            return max(len(string_1), len(string_2))
+        tol = self.tolerance()
+        guess = message.lower()
+        cached = self.guess_cache.get(guess)
+        if cached is None:
+            cached = self.prefilter_guess(guess, tol)
+            if cached is None:
+                cached = (self.closeness(guess), "edit")
+            self.guess_cache.put(guess, cached)
+        closeness, stage = cached
+        self.last_closeness = closeness
+        if stage == "prefilter":
+            self.last_stage = stage
+            return False
+        LOG.info("Difference: %f | Tolerance %f", closeness, tol,
+                 extra={"sample": "match"})
+        return closeness < tol
+
+    def warm_guesses(self, messages, executor):
+        """Score a batch of guesses at the current question on
+        `executor` and store the results in the guess cache, so that
+        checking them one by one afterwards only does cache lookups.
+
+        Guesses which are cached or accepted forms of the answer are
+        left to :meth:`check_answer`, and prefilter rejections are
+        cached as they are found.
+        """
+        tol = self.tolerance()
+        qid = self.question_id()
+        guesses = set()
+        for message in messages:
+            guess = message.strip().lower()
+            if (guess in self.guess_cache or guess in guesses
+                    or self.store.is_alias(qid, normalize_answer(guess))):
+                continue
+            rejected = self.prefilter_guess(guess, tol)
+            if rejected is not None:
+                self.guess_cache.put(guess, rejected)
+                continue
+            guesses.add(guess)
+        if len(guesses) < 2:
+            return
+        for guess, closeness in zip(guesses,
+                                    executor.map(self.closeness, guesses)):
+            self.guess_cache.put(guess, (closeness, "edit"))
 
-        tol = 0.4 - 0.15 * self.hint_req
+    def prefilter_guess(self, guess, tol):
+        """Return the guess cache entry of `guess` if the prefilter
+        rejects it at `tol`, otherwise None.
+        """
+        if self.prefilter is None:
+            return None
+        bound = self.prefilter.lower_bound(guess)
+        if bound < tol:
+            return None
+        self.filtered += 1
+        return (bound, "prefilter")
+
+    def closeness(self, guess):
+        """Return the cost of the best alignment of the guess tokens to
+        the answer tokens, averaged over the longer of the two. Paired
+        tokens cost their normalized edit distance and unpaired tokens
+        cost 1, except articles which cost nothing and do not count
+        towards the length.
+        """
         ans_parts = self.answer().lower().split(" ")
-        msg_parts = message.lower().split(" ")
-        dist = [self.comparer.compare(a, m, 2 ** 31 - 1) / max_len(a, m)
-                for a, m in zip(ans_parts, msg_parts)]
-        if len(ans_parts) != len(msg_parts):
-            dist.extend([1.0] * abs(len(ans_parts) - len(msg_parts)))
-        closeness = mean(dist)
-        LOG.info("Difference: %f | Tolerance %f", closeness, tol)
-        return closeness < tol
+        msg_parts = guess.split(" ")
+        # A pair costing TOLERANCE * len(ans_parts) or more cannot be
+        # part of an alignment within tolerance, whatever the length of
+        # the guess, so the distance is only computed up to there and
+        # larger ones count as 1, unless uncapped
+        bound = self.TOLERANCE * len(ans_parts)
+
+        def pair_cost(i, j):
+            key = (ans_parts[i], msg_parts[j])
+            cost = self.token_distances.get(key)
+            if cost is None:
+                longest = max(len(key[0]), len(key[1]))
+                if longest == 0:
+                    cost = 0.0
+                else:
+                    limit = (longest if self.uncapped
+                             else math.ceil(bound * longest) - 1)
+                    dist = self.comparer.compare(key[0], key[1], limit)
+                    cost = 1.0 if dist < 0 else dist / longest
+                self.token_distances.put(key, cost)
+            return cost
+
+        ans_gaps = gap_costs(ans_parts)
+        msg_gaps = gap_costs(msg_parts)
+        total = align_tokens(ans_gaps, msg_gaps, pair_cost)
+        return total / max(sum(ans_gaps), sum(msg_gaps))
+
+    def build_quizset(self, num_qs, mix=None):
+        if mix:
+            self.build_category_quizset(num_qs, mix)
+            return
+        self.use_quizset(self.prepare_quizset(self.store, num_qs))
 
-    def build_quizset(self, num_qs, tsrows, ts):
-        def clean_entry(phrase):
-            replacement_dict = {"\\'": "'", "<i>": "", "</i>": "", "\"": ""}
-            return replace_multiple_substring(replacement_dict, phrase)
-        # try getting questions from jservice first
+    def fetch_clues(self, num_qs):
+        """Fetch random clues from jservice, or none if the remote is
+        disabled or unavailable.
+        """
+        if not self.use_remote:
+            return []
         try:
-            req = requests.get(f"http://jservice.io/api/random?count={num_qs}")
-            clues = req.json()
-        except json.decoder.JSONDecodeError:
-            clues = []
-
-        for clue in clues:
-            quiz_entry = {"Category": clean_entry(clue["category"]["title"]),
-                          "Question": clean_entry(clue["question"]),
-                          "Answer": clean_entry(clue["answer"])}
-            if any(val == "" for val in quiz_entry.values()):
-                continue
-            self.data = self.data.append(quiz_entry, ignore_index=True)
-        # Create a list of all indices
-        row_list = list(range(tsrows))
-        num_qs_left = num_qs - len(self.data)
-        n = 0
-        while n < num_qs_left:
-            row_idx = random.choice(row_list)
-            row_list.remove(row_idx)
-            try:
-                # Check for duplicates with last argument, skip if so
-                self.data = self.data.append(ts.loc[row_idx],
-                                             verify_integrity=True)
-                n += 1
-            except:
-                # pass on duplicates and re-roll
-                LOG.warning("Duplicate index. This should not happen, "
-                            "dropping row from table. Please check "
-                            "config.txt's questions are <= total # of "
-                            "questions in trivia set.")
-                ts.drop(ts.index[[row_idx]])
-        LOG.info("Quizset built.")
+            req = requests.get(
+                f"http://jservice.io/api/random?count={num_qs}",
+                timeout=10)
+            return req.json()
+        except (json.decoder.JSONDecodeError,
+                requests.RequestException) as e:
+            LOG.warning("Remote questions NOT fetched! Reason: %s", e)
+            return []
+
+    def prepare_quizset(self, store, num_qs):
+        """Fetch and sample the questions of a quizset without touching
+        the session or the store, so it can run in a background thread.
+
+        Returns
+        -------
+        Quizset
+        """
+        start = time.perf_counter()
+        clues = self.fetch_clues(num_qs)
+        # Remote clues get new ids when they are added to the store, so
+        # they never collide with the sampled ones
+        sample = random.sample(range(len(store)), min(len(store), num_qs))
+        return Quizset(store, num_qs, clues, sample,
+                       time.perf_counter() - start)
+
+    def use_quizset(self, quizset):
+        """Make a prepared quizset the session's questions. Remote clues
+        are cleaned and cached in the store like the local triviaset.
+        """
+        clues = quizset.clues
+        self.data = self.store.add_many(
+            [clue["category"]["title"] for clue in clues],
+            [clue["question"] for clue in clues],
+            [clue["answer"] for clue in clues])[: quizset.num_qs]
+        self.data.extend(quizset.sample[: quizset.num_qs - len(self.data)])
+        LOG.info("Quizset built in %.3fs.", quizset.build_time)
+
+    def build_category_quizset(self, num_qs, mix):
+        """Build the quizset from the store's category index only.
+
+        Parameters
+        ----------
+        num_qs : int
+            Number of questions in the session.
+        mix : list of (str, int)
+            Categories and their relative weights.
+        """
+        weights = {}
+        for category, weight in mix:
+            key = category.lower()
+            weights[key] = weights.get(key, 0) + weight
+        total = sum(weights.values())
+        # Largest remainder allocation of num_qs by weight
+        shares = [(num_qs * weight / total, category)
+                  for category, weight in weights.items()]
+        counts = {category: int(share) for share, category in shares}
+        leftover = num_qs - sum(counts.values())
+        for share, category in sorted(shares, key=lambda x: x[0] - int(x[0]),
+                                      reverse=True)[: leftover]:
+            counts[category] += 1
+        self.data = []
+        for category, count in counts.items():
+            self.data.extend(self.store.draw(category, count))
+        random.shuffle(self.data)
+        LOG.info("Quizset built from categories: %s", counts)
+
+    def prepare_question(self, num_hints):
+        self.ask_time = self.clock.time()
+        self.token_distances.clear()
+        self.phonetic_matches.clear()
+        self.prefilter = AnswerPrefilter(self.answer())
+        self.prepare_hints(num_hints)
+
+    def prepare_hints(self, num_hints):
+        """Fix the reveal order of the current answer once, so that each
+        hint extends the previous one.
+        """
+        answer = self.answer()
+        self.hint_order = [i for i, c in enumerate(answer) if c.isalnum()]
+        random.shuffle(self.hint_order)
+        n = len(answer)
+        self.hint_counts = [min(len(self.hint_order),
+                                (i + 1) * n // (num_hints + 1))
+                            for i in range(num_hints)]
 
     def ask_hint(self, hint_type):
-        if hint_type <= self.hint_req:
+        if (hint_type <= self.hint_req
+                or self.hint_req >= len(self.hint_counts)):
             return None
         self.hint_req += 1
         prehint = self.answer()
-        n = len(prehint)
-        idx = random.sample(range(n), k=self.hint_req * n // 3)
-        return "".join(c if i in idx or not c.isalnum() else "_"
-                       for i, c in enumerate(prehint))
+        mask = bytearray(c.isalnum() for c in prehint)
+        for i in self.hint_order[: self.hint_counts[self.hint_req - 1]]:
+            mask[i] = 0
+        return "".join("_" if hidden else c
+                       for c, hidden in zip(prehint, mask))
+
+    def question_id(self):
+        return self.data[self.q_no]
 
     def category(self):
-        return self.data.iloc[self.q_no, 0]
+        return self.store.category(self.question_id())
 
     def question(self):
-        return self.data.iloc[self.q_no, 1]
+        return self.store.question(self.question_id())
 
     def answer(self):
-        return self.data.iloc[self.q_no, 2]
+        return self.store.answer(self.question_id())
 
     def check_answer(self, message):
-        return self.fuzzy_match(message)
+        """Try the matchers in order until one accepts the guess. Key
+        lookups come first so the edit distance only runs for guesses
+        none of them accept.
+        """
+        self.last_closeness = 1.0
+        self.last_stage = ""
+        for matcher in self.matchers:
+            self.last_stage = matcher
+            if getattr(self, self.MATCHERS[matcher])(message):
+                return True
+        return False
+
+    def match_exact(self, message):
+        if message.lower() == self.answer().lower():
+            self.last_closeness = 0.0
+            return True
+        return False
+
+    def match_normalized(self, message):
+        if self.store.is_alias(self.question_id(), normalize_answer(message)):
+            self.last_closeness = 0.0
+            return True
+        return False
+
+    def match_phonetic(self, message):
+        closeness = self.phonetic_matches.get(message)
+        if closeness is None:
+            closeness = self.phonetic_closeness(normalize_answer(message))
+            self.phonetic_matches.put(message, closeness)
+        if closeness < self.PHONETIC_TOLERANCE:
+            self.last_closeness = closeness
+            return True
+        return False
+
+    def phonetic_closeness(self, guess):
+        """Return the normalized distance of a normalized `guess` to the
+        nearest form of the answer sharing its phonetic key, or 1.0 if
+        it is not within PHONETIC_TOLERANCE of any.
+        """
+        key = self.store.phonetic_key(guess)
+        if len(key.replace(" ", "")) < self.MIN_PHONETIC_KEY:
+            return 1.0
+        # Keys alone group too many words ("sperm" and "supreme"), so
+        # the guess must also be near the form whose key it matched
+        for form in self.store.sound_alikes(self.question_id(), key):
+            longest = max(len(form), len(guess))
+            dist = self.comparer.compare(
+                form, guess, math.floor(self.PHONETIC_TOLERANCE * longest))
+            if 0 <= dist < self.PHONETIC_TOLERANCE * longest:
+                return dist / longest
+        return 1.0
+
+    def set_uncapped(self, uncapped):
+        if uncapped != self.uncapped:
+            self.uncapped = uncapped
+            # Cached values were computed with the other setting
+            self.guess_cache.clear()
+            self.token_distances.clear()
 
     def set_ask_time(self, ask_time):
         self.ask_time = ask_time
 
+    def cache_stats(self):
+        """Return the hits, misses and hit rate of the guess cache for
+        the current question.
+        """
+        lookups = self.guess_cache.hits + self.guess_cache.misses
+        return (self.guess_cache.hits, self.guess_cache.misses,
+                self.guess_cache.hits / lookups if lookups else 0.0)
+
     def prepare_next_question(self):
+        LOG.info("Guess cache hits: %d | misses: %d | hit rate: %f",
+                 *self.cache_stats())
+        LOG.info("Guesses rejected by prefilter: %d", self.filtered)
+        self.guess_cache.clear()
+        self.prefilter = None
+        self.filtered = 0
         self.q_no += 1
         self.hint_req = 0
+        self.hint_order = []
+        self.hint_counts = []
         self.ask_time = 0
 
-    def is_game_over(self, num_qs):
-        return num_qs == self.q_no
+    def is_game_over(self):
+        # A reset session has no quizset and is not over
+        return bool(self.data) and self.q_no >= len(self.data)
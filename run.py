@@ -1,9 +1,12 @@
 import logging
 
 from chagtriviabot.bot import ChagTriviaBot
+from chagtriviabot.logsetup import setup_logging
 
 FORMAT = '%(asctime)-15s %(levelname)7s %(name)7s: %(message)s'
-logging.basicConfig(format=FORMAT, level=logging.INFO)
+# Chat lines and guess checks are logged at most this often per second
+SAMPLE_RATE = 5
+setup_logging(FORMAT, logging.INFO, SAMPLE_RATE)
 
 BOT = ChagTriviaBot()
 BOT.prepare()
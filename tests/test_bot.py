@@ -0,0 +1,118 @@
+import logging
+import os
+
+import pytest
+
+from chagtriviabot import bot as bot_module
+from chagtriviabot.bot import ChagTriviaBot
+from chagtriviabot.clock import SimulatedClock
+from chagtriviabot.simulator import ScriptedChat
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+@pytest.fixture(scope="module")
+def loaded_bot():
+    logging.disable(logging.WARNING)
+    cwd = os.getcwd()
+    # config.ini and the trivia set it names are read from the cwd
+    os.chdir(ROOT)
+    try:
+        bot = ChagTriviaBot(SimulatedClock())
+        bot.load_config()
+    finally:
+        os.chdir(cwd)
+    yield bot
+    logging.disable(logging.NOTSET)
+
+@pytest.fixture
+def bot(loaded_bot, tmp_path, monkeypatch):
+    # scores and checkpoints are written relative to the cwd
+    monkeypatch.setattr(bot_module, "CONFIG_PATH",
+                        os.path.join(ROOT, "config.ini"))
+    monkeypatch.chdir(tmp_path)
+    loaded_bot.scores.data = {}
+    loaded_bot.scores.is_loaded = True
+    loaded_bot.chat = ScriptedChat(loaded_bot)
+    loaded_bot.session.use_remote = False
+    loaded_bot.set_score_service("")
+    return loaded_bot
+
+def command(bot, name):
+    bot.process_message(bot.var.ADMINS[0], f"{bot.var.PREFIX}{name}")
+
+def test_end_during_answer_window_then_restart(bot):
+    bot.arbiter.window = 5.0
+    command(bot, "triviastart")
+    bot.process_message("alice", bot.session.answer())
+    assert bot.arbiter.is_open()
+
+    command(bot, "triviaend")
+    assert not bot.is_active
+    assert not bot.arbiter.is_open()
+
+    command(bot, "triviastart")
+    bot.clock.sleep(bot.arbiter.window)
+    bot.routine_check()
+    assert bot.session.q_no == 0
+    assert bot.scores.get_session_top(3) == []
+
+def test_rejected_reload_keeps_trivia_set(bot, monkeypatch):
+    store = bot.var.store
+    read_config = bot.read_config
+
+    def rejected_config():
+        config = read_config()
+        config["Trivia"]["filename"] = "small"
+        config["Admin"]["admins"] = ""
+        return config
+
+    with open("small.csv", "w") as small:
+        small.write("Category,Question,Answer\nc,q,a\n")
+    monkeypatch.setattr(bot, "read_config", rejected_config)
+    assert not bot.reload_config()
+    if bot.store_loader is not None:
+        bot.store_loader.join()
+    assert bot.pending_store is None
+    assert bot.var.store is store
+    assert bot.is_ready()
+
+class StubScoreService:
+    socket_path = "stub"
+
+    def __init__(self):
+        self.queries = 0
+
+    def add(self, username, points=0, wins=0):
+        pass
+
+    def top(self, n):
+        self.queries += 1
+        return [["alice", 1, 5]]
+
+    def stats(self, username):
+        self.queries += 1
+        return [5, 1]
+
+    def close(self):
+        pass
+
+def test_score_service_replies_are_cached_and_not_dumped(bot, monkeypatch):
+    service = StubScoreService()
+    monkeypatch.setattr(bot, "score_service", service)
+    bot.render_cache.clear()
+    # Commands take a second each, start at a cache period boundary
+    bot.clock.sleep(-bot.clock.time() % bot.SERVICE_CACHE_TTL)
+    for _ in range(3):
+        bot.process_message("bob", f"{bot.var.PREFIX}top")
+        bot.process_message("bob", f"{bot.var.PREFIX}score")
+    assert service.queries == 2
+    bot.clock.sleep(bot.SERVICE_CACHE_TTL)
+    bot.process_message("bob", f"{bot.var.PREFIX}top")
+    assert service.queries == 3
+
+    command(bot, "triviastart")
+    bot.process_message("alice", bot.session.answer())
+    bot.clock.sleep(bot.arbiter.window)
+    bot.routine_check()
+    command(bot, "triviaend")
+    assert not os.path.exists(bot_module.SCORES_PATH)
@@ -0,0 +1,53 @@
+from chagtriviabot.chat import Chat
+from chagtriviabot.clock import SimulatedClock
+
+class ChokedSocket:
+    """Takes at most `limit` bytes per send, then reports a full buffer
+    until `limit` is raised again.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.data = bytearray()
+
+    def send(self, data):
+        if self.limit == 0:
+            raise BlockingIOError
+        taken = bytes(data[: self.limit])
+        self.limit -= len(taken)
+        self.data += taken
+        return len(taken)
+
+class Bot:
+    clock = SimulatedClock()
+
+def connected_chat(sock):
+    chat = Chat(Bot())
+    chat.set_config({"host": "localhost", "port": "6667", "nick": "bot",
+                     "pass": "oauth:x", "chan": "#chan"})
+    chat.socket = sock
+    chat.is_connected = True
+    return chat
+
+def test_partial_send_resumes_the_line():
+    sock = ChokedSocket(10)
+    chat = connected_chat(sock)
+    chat.send_msg("first")
+    chat.send_msg("second")
+    assert chat.sent == 10
+    sock.limit = 10 ** 6
+    chat.flush()
+    assert not chat.outbox
+    lines = bytes(sock.data).split(b"\r\n")
+    assert lines[0].endswith(b" : first")
+    assert lines[1].endswith(b" : second")
+
+def test_pong_waits_for_the_partly_sent_line():
+    sock = ChokedSocket(10)
+    chat = connected_chat(sock)
+    chat.send_msg("first")
+    chat.send_command(b"PONG :tmi.twitch.tv\r\n")
+    sock.limit = 10 ** 6
+    chat.flush()
+    lines = bytes(sock.data).split(b"\r\n")
+    assert lines[0].endswith(b" : first")
+    assert lines[1] == b"PONG :tmi.twitch.tv"
@@ -0,0 +1,18 @@
+import tracemalloc
+
+from chagtriviabot.clock import SimulatedClock
+from chagtriviabot.memprofile import MemoryProfiler
+
+def test_tracing_stops_when_interval_goes_back_to_zero():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    profiler = MemoryProfiler()
+    clock = SimulatedClock()
+    profiler.configure(60, clock)
+    assert tracemalloc.is_tracing()
+    profiler.snapshot(clock.time())
+    assert profiler.previous is not None
+
+    profiler.configure(0, clock)
+    assert not tracemalloc.is_tracing()
+    assert profiler.previous is None
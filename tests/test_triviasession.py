@@ -0,0 +1,52 @@
+import pytest
+
+from chagtriviabot.questionstore import QuestionStore
+from chagtriviabot.triviasession import TriviaSession
+
+@pytest.fixture
+def session():
+    store = QuestionStore()
+    store.add_many(["Law", "Music", "Music"],
+                   ["Highest court?", "Fab four?", "Swan Lake composer?"],
+                   ["Supreme", "Beatles", "Tchaikovsky"])
+    session = TriviaSession()
+    session.reset(store)
+    session.use_remote = False
+    return session
+
+def ask(session, qid):
+    session.data = [qid]
+    session.q_no = 0
+    session.prepare_question(2)
+
+def test_uncapped_closeness_of_far_guess(session):
+    ask(session, 0)
+    assert session.closeness("sperm") == 1.0
+    session.set_uncapped(True)
+    assert session.closeness("sperm") == pytest.approx(3 / 7)
+
+def test_leading_article_is_free(session):
+    ask(session, 1)
+    assert session.closeness("the beatles") == 0.0
+
+def test_sound_alike_is_matched_and_cached(session):
+    ask(session, 2)
+    assert session.match_phonetic("Chaikofsky")
+    assert not session.match_phonetic("sperm")
+    assert session.phonetic_matches.get("Chaikofsky") < 0.35
+    assert session.phonetic_matches.get("sperm") == 1.0
+
+def test_prefilter_rejection_is_cached(session):
+    ask(session, 2)
+    assert not session.fuzzy_match("what a weird question")
+    assert session.guess_cache.get("what a weird question")[1] == "prefilter"
+    assert not session.fuzzy_match("what a weird question")
+    assert session.filtered == 1
+    assert session.last_stage == "prefilter"
+
+def test_prefilter_bound_never_exceeds_closeness(session):
+    ask(session, 2)
+    for guess in ["tchaikovsky", "chaikofsky", "tchaikovksy", "kovsky",
+                  "the tchaikovsky", "vtchaikosky a"]:
+        assert (session.prefilter.lower_bound(guess)
+                <= session.closeness(guess) + 1e-9)